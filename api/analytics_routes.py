@@ -0,0 +1,58 @@
+from flask import Blueprint, jsonify, request
+from repositories.analytics_repository import GROUP_BY_FIELDS, db_get_occupancy, db_get_revenue
+from repositories.room_type_repository import db_room_type_exists
+from repositories.season_calendar import SEASON_CALENDAR_FIRST_YEAR
+from api.response_cache import cached_response
+from database.data_versions import BOOKINGS, ROOM_TYPES, SEASONS
+
+# Blueprint for analytics routes over the historical bookings
+analytics_routes = Blueprint('analytics', __name__)
+
+# Parses ?group_by=room_type,season and ?room_type_id=, returns (group_by, room_type_id, error, status)
+def _parse_analytics_args():
+    group_by = tuple(request.args.get('group_by', 'room_type,season').split(','))
+    if not group_by or len(set(group_by)) != len(group_by) or not set(group_by) <= GROUP_BY_FIELDS.keys():
+        return None, None, f"Query parameter group_by must be a comma separated list of {', '.join(GROUP_BY_FIELDS)}", 400
+
+    room_type_id = request.args.get('room_type_id')
+    if room_type_id is not None:
+        if not room_type_id.isdigit():
+            return None, None, "Invalid query parameter: room_type_id", 400
+        room_type_id = int(room_type_id)
+        if not db_room_type_exists(room_type_id):
+            return None, None, "Room type not found", 404
+    return group_by, room_type_id, None, None
+
+# GET bookings, nights, revenue and ADR (average daily rate) per room type and season
+# Optional: ?group_by=room_type|season|room_type,season, ?room_type_id=
+@analytics_routes.route('/revenue', methods=['GET'])
+@cached_response(BOOKINGS, ROOM_TYPES, SEASONS)
+def get_revenue():
+    try:
+        group_by, room_type_id, error, status = _parse_analytics_args()
+        if error:
+            return jsonify({"error": error}), status
+
+        results = db_get_revenue(group_by, room_type_id)
+        return jsonify({"group_by": list(group_by), "results": results}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# GET booked nights against capacity (max_count × season days of the year) per room type and season
+# Optional: ?year= (season calendar year, default SEASON_CALENDAR_FIRST_YEAR), ?group_by=, ?room_type_id=
+@analytics_routes.route('/occupancy', methods=['GET'])
+@cached_response(BOOKINGS, ROOM_TYPES, SEASONS)
+def get_occupancy():
+    try:
+        group_by, room_type_id, error, status = _parse_analytics_args()
+        if error:
+            return jsonify({"error": error}), status
+
+        year = request.args.get('year', str(SEASON_CALENDAR_FIRST_YEAR))
+        if not year.isdigit() or not 1 <= int(year) <= 9999:
+            return jsonify({"error": "Invalid query parameter: year"}), 400
+
+        results = db_get_occupancy(int(year), group_by, room_type_id)
+        return jsonify({"year": int(year), "group_by": list(group_by), "results": results}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
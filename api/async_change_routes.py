@@ -0,0 +1,133 @@
+import asyncio
+from urllib.parse import parse_qsl
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+from api.change_routes import (
+    EVENT_STREAM_KEEPALIVE_SECONDS,
+    changes_page,
+    format_change_event,
+    parse_changes_args,
+    resolve_since,
+)
+from database.data_versions import get_change_generation, wait_for_change
+from repositories.change_repository import db_get_changes
+
+# Path of the change feed, whose waiting requests are served on the event loop in async server mode
+CHANGES_PATH = '/api/v1/changes'
+
+# Wakes all event-loop waiters of the process on every change, one thread waits on the data version condition
+class ChangeNotifier:
+    def __init__(self):
+        self.generation = None
+        self._condition = None
+        self._task = None
+
+    # Follows the change generation in a worker thread and notifies waiters when it moves
+    async def _follow(self):
+        while True:
+            await asyncio.to_thread(wait_for_change, self.generation, 1.0)
+            generation = await asyncio.to_thread(get_change_generation)
+            if generation != self.generation:
+                async with self._condition:
+                    self.generation = generation
+                    self._condition.notify_all()
+
+    # Waits until the generation differs from generation or timeout seconds passed, returns True on change
+    async def wait(self, generation, timeout):
+        if self._task is None:
+            self._condition = asyncio.Condition()
+            self.generation = await asyncio.to_thread(get_change_generation)
+            self._task = asyncio.create_task(self._follow())
+        async with self._condition:
+            try:
+                await asyncio.wait_for(self._condition.wait_for(lambda: self.generation != generation), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    # Returns the generation seen by the notifier (read before the changes, so no change is missed)
+    async def current(self):
+        if self._task is None:
+            return await asyncio.to_thread(get_change_generation)
+        return self.generation
+
+# Serves change feed event streams and long-polls on the event loop, so waiting subscribers hold no request thread;
+# every other request goes to the WSGI app (the Flask view gives the same responses, see api/change_routes.py)
+class AsyncChangeFeed:
+    def __init__(self, flask_app, wsgi):
+        self.flask_app = flask_app
+        self.wsgi = wsgi
+        self.notifier = ChangeNotifier()
+
+    # Sends a complete JSON response encoded like Flask's jsonify
+    async def _send_json(self, send, body, status, headers=()):
+        data = (self.flask_app.json.dumps(body) + '\n').encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(data)).encode()), *headers]})
+        await send({"type": "http.response.body", "body": data})
+
+    # Long-poll: wait for a write, then read again, like the Flask view
+    async def _long_poll(self, send, since, limit, wait):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            generation = await self.notifier.current()
+            changes = await asyncio.to_thread(db_get_changes, since, limit)
+            remaining = deadline - loop.time()
+            if changes or remaining <= 0 or not await self.notifier.wait(generation, remaining):
+                break
+        await self._send_json(send, changes_page(changes, since, limit), 200)
+
+    # Streams changes as Server-Sent Events until the client disconnects
+    async def _event_stream(self, send, since, limit):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                                (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]})
+        while True:
+            generation = await self.notifier.current()
+            changes = await asyncio.to_thread(db_get_changes, since, limit)
+            body = ''.join(format_change_event(change, self.flask_app.json) for change in changes)
+            if changes:
+                since = changes[-1]['seq']
+            elif not await self.notifier.wait(generation, EVENT_STREAM_KEEPALIVE_SECONDS):
+                body = ": keep-alive\n\n"
+            if body:
+                await send({"type": "http.response.body", "body": body.encode(), "more_body": True})
+
+    # Runs a waiting change feed request until it finishes or the client disconnects
+    async def _serve(self, scope, receive, send, streaming):
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        args = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+        since, limit, wait, error = parse_changes_args(args, headers.get('last-event-id'))
+        if error:
+            return await self._send_json(send, {"error": error}, 400)
+
+        try:
+            since, body, status = await asyncio.to_thread(resolve_since, since, streaming)
+        except Exception as e:
+            return await self._send_json(send, {"error": str(e)}, 500)
+        if body is not None:
+            return await self._send_json(send, body, status)
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        serving = asyncio.create_task(self._event_stream(send, since, limit) if streaming
+                                      else self._long_poll(send, since, limit, wait))
+        watching = asyncio.create_task(disconnected())
+        done, pending = await asyncio.wait((serving, watching), return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        if serving in done and serving.exception() is not None:
+            raise serving.exception()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] == CHANGES_PATH:
+            accept = next((value.decode('latin-1') for name, value in scope['headers'] if name.lower() == b'accept'), None)
+            streaming = parse_accept_header(accept, MIMEAccept).best == 'text/event-stream'
+            wait = dict(parse_qsl(scope['query_string'].decode('latin-1'))).get('wait', '0')
+            if streaming or wait not in ('', '0'):
+                return await self._serve(scope, receive, send, streaming)
+        return await self.wsgi(scope, receive, send)
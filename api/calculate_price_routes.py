@@ -1,12 +1,28 @@
+from datetime import datetime, timedelta
 from flask import Blueprint, jsonify, request
-from datetime import datetime
-from repositories.calculate_price_repository import db_calculate_total_price, db_get_season_by_id, db_get_season_by_date
-from repositories.room_type_repository import db_get_room_type
+from repositories.calculate_price_repository import (
+    db_calculate_batch_prices,
+    db_calculate_price_breakdown,
+    db_get_price_grid,
+    db_get_season_by_date,
+    db_get_season_by_id,
+)
+from repositories.room_type_repository import db_get_room_types, db_room_type_exists
+from api.response_cache import cached_response, coalesced_response
+from api.validation import parse_date_range
+from database.data_versions import ROOM_TYPES, SEASONS
 
 calculate_price_routes = Blueprint('calculate_price_routes', __name__)
 
+# Maximum number of quotes accepted by a single batch request
+MAX_BATCH_QUOTES = 500
+
+# Longest price grid (nights) returned by a single request
+MAX_GRID_DAYS = 731
+
 # GET Season name by id
 @calculate_price_routes.route('/season_type/<int:season_id>', methods=['GET'])
+@cached_response(SEASONS)
 def get_season_name(season_id):
     try:
         season = db_get_season_by_id(season_id)
@@ -16,32 +32,129 @@ def get_season_name(season_id):
 
 # GET total price for stay duration by room type and start/end dates
 # Example: /api/v1/calculate_price/1?start_date=2024-11-01&end_date=2024-11-03 (YYYY-MM-DD)
+# Add &breakdown=true for the price per season segment of the stay
 @calculate_price_routes.route('/<int:room_type_id>', methods=['GET'])
+@coalesced_response
 def get_total_price(room_type_id):
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-
-    # Check if room type exists
-    if db_get_room_type(room_type_id) is None:
-        return jsonify({"error": "Room type not found"}), 404
-
-    # Check if start_date and end_date are present and valid
-    if not start_date or not end_date:
-        return jsonify({"error": "Missing field: start_date or end_date as query parameters"}), 400
+    # Check if start_date and end_date are present and valid before touching the database
+    start_date_dt, end_date_dt, error = parse_date_range(
+        request.args, missing_error="Missing field: start_date or end_date as query parameters")
+    if error:
+        return jsonify({"error": error}), 400
 
     try:
-        # Ensure the start and end dates are parsed correctly as datetime objects
-        start_date_dt = datetime.strptime(start_date, "%Y-%m-%d")
-        end_date_dt = datetime.strptime(end_date, "%Y-%m-%d")
+        # Check if room type exists (answered from the in-memory id set, read from the same source as the base price)
+        if not db_room_type_exists(room_type_id):
+            return jsonify({"error": "Room type not found"}), 404
 
-        season = db_get_season_by_date(start_date_dt)
-        total_price = db_calculate_total_price(room_type_id, start_date_dt, end_date_dt)
+        # The id set and the price may come from two successive snapshots, the quote has the final say
+        quote = db_calculate_price_breakdown(room_type_id, start_date_dt, end_date_dt)
+        if quote is None:
+            return jsonify({"error": "Room type not found"}), 404
 
         response = {
-            "price": total_price,
-            "season": season
+            "price": quote["price"],
+            "season": db_get_season_by_date(start_date_dt)
         }
 
+        # Optional per-season breakdown: season_type, multiplier, nights, nightly_rate, subtotal
+        if request.args.get('breakdown') == 'true':
+            response["breakdown"] = quote["breakdown"]
+
+        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# GET nightly rate of every room type for every night of a period, e.g. to publish rates to booking channels
+# Example: /api/v1/calculate_price/grid?start=2024-11-01&days=365 (start is YYYY-MM-DD, days defaults to 365)
+# Returns one {room_type_id, date, price} per room type and night, add &compact=true for one rates array per room type
+@calculate_price_routes.route('/grid', methods=['GET'])
+@cached_response(ROOM_TYPES, SEASONS)
+def get_price_grid():
+    start = request.args.get('start')
+    if not start:
+        return jsonify({"error": "Missing query parameter: start"}), 400
+    try:
+        start_date_dt = datetime.strptime(start, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "Invalid date format, expected YYYY-MM-DD"}), 400
+
+    days = request.args.get('days', '365')
+    if not days.isdigit() or not 1 <= int(days) <= MAX_GRID_DAYS:
+        return jsonify({"error": f"Query parameter days must be between 1 and {MAX_GRID_DAYS}"}), 400
+    days = int(days)
+
+    try:
+        room_types, rates = db_get_price_grid(start_date_dt, days)
+        response = {"start": start_date_dt.strftime("%Y-%m-%d"), "days": days}
+
+        if request.args.get('compact') == 'true':
+            response["room_types"] = [{**room_type, "rates": room_type_rates}
+                                      for room_type, room_type_rates in zip(room_types, rates)]
+        else:
+            dates = [(start_date_dt + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days)]
+            response["grid"] = [{"room_type_id": room_type["id"], "date": date, "price": price}
+                                for room_type, room_type_rates in zip(room_types, rates)
+                                for date, price in zip(dates, room_type_rates)]
+
         return jsonify(response), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+# POST total prices for many stays in one request
+# Body: {"quotes": [{"room_type_id": 1, "start_date": "2024-11-01", "end_date": "2024-11-03"}, ...]}
+#   or: {"start_date": "2024-11-01", "end_date": "2024-11-03"} to price every room type for that range
+@calculate_price_routes.route('/batch', methods=['POST'])
+def get_batch_prices():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid or missing JSON body"}), 400
+
+    # Validate the whole request before touching the database
+    if 'quotes' in data:
+        items = data['quotes']
+        if not isinstance(items, list) or not items or len(items) > MAX_BATCH_QUOTES:
+            return jsonify({"error": f"Field quotes must be a list of 1 to {MAX_BATCH_QUOTES} items"}), 400
+    else:
+        items = [data]
+
+    stays = []
+    for item in items:
+        if not isinstance(item, dict):
+            return jsonify({"error": "Every quote must be an object"}), 400
+        if 'quotes' in data and (not isinstance(item.get('room_type_id'), int) or isinstance(item['room_type_id'], bool)):
+            return jsonify({"error": "Invalid or missing field: room_type_id"}), 400
+        start_date_dt, end_date_dt, error = parse_date_range(item)
+        if error:
+            return jsonify({"error": error}), 400
+        stays.append((item.get('room_type_id'), start_date_dt, end_date_dt))
+
+    try:
+        room_types = db_get_room_types()
+
+        # Build (room_type_id, start_date, end_date) tuples from either request shape
+        if 'quotes' in data:
+            quotes = stays
+        else:
+            _, start_date_dt, end_date_dt = stays[0]
+            quotes = [(room_type['id'], start_date_dt, end_date_dt) for room_type in room_types]
+
+        prices = db_calculate_batch_prices(quotes, room_types)
+        known_ids = {room_type['id'] for room_type in room_types}
+
+        response = []
+        for (room_type_id, start_date_dt, end_date_dt), price in zip(quotes, prices):
+            quote = {
+                "room_type_id": room_type_id,
+                "start_date": start_date_dt.strftime("%Y-%m-%d"),
+                "end_date": end_date_dt.strftime("%Y-%m-%d"),
+                "price": price,
+                "season": db_get_season_by_date(start_date_dt)
+            }
+            if room_type_id not in known_ids:
+                quote["error"] = "Room type not found"
+            response.append(quote)
+
+        return jsonify({"quotes": response}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from flask import Blueprint, Response, current_app, jsonify, request
+from repositories.change_repository import db_get_change_bounds, db_get_changes
+from database.data_versions import get_change_generation, wait_for_change
+
+# Blueprint for the change feed
+change_routes = Blueprint('changes', __name__)
+
+# Maximum number of changes returned by a single request
+MAX_CHANGES_PAGE_SIZE = 1000
+
+# Maximum seconds a long-polling request waits for new changes
+MAX_CHANGES_WAIT_SECONDS = 30
+
+# Seconds without changes after which an event stream sends a keep-alive comment
+EVENT_STREAM_KEEPALIVE_SECONDS = 15
+
+# Event streams and long-polls served at once by this process's request threads (can be overridden with
+# CHANGE_FEED_MAX_WAITERS); each holds a thread while it waits, so this must stay below the thread count or
+# subscribers starve all other requests (gunicorn.conf.py sets half the threads, async mode waits on the event loop)
+CHANGE_FEED_MAX_WAITERS = int(os.environ.get('CHANGE_FEED_MAX_WAITERS', 4))
+
+# Seconds a client turned away because all waiter slots are taken should wait before retrying
+CHANGE_FEED_RETRY_AFTER_SECONDS = 5
+
+_waiters = threading.BoundedSemaphore(CHANGE_FEED_MAX_WAITERS)
+
+# Formats a change as a Server-Sent Event, the sequence number is the event id
+# (encoded by the app's JSON provider, so the data matches the changes of the JSON response)
+def format_change_event(change, json_provider):
+    return f"id: {change['seq']}\nevent: change\ndata: {json_provider.dumps(change)}\n\n"
+
+# Yields changes after since as Server-Sent Events until the client disconnects
+# (runs after the view returned, outside the app context, so it gets the JSON provider passed in)
+def _event_stream(since, limit, json_provider):
+    while True:
+        generation = get_change_generation()
+        changes = db_get_changes(since, limit)
+        for change in changes:
+            yield format_change_event(change, json_provider)
+        if changes:
+            since = changes[-1]['seq']
+        elif not wait_for_change(generation, EVENT_STREAM_KEEPALIVE_SECONDS):
+            yield ": keep-alive\n\n"
+
+# Parses since (or the Last-Event-ID header), limit and wait of a change feed request
+# Returns (since, limit, wait, error); shared with the event loop implementation in api/async_change_routes.py
+def parse_changes_args(args, last_event_id):
+    parameters = {}
+    for name, default in (('since', None), ('limit', MAX_CHANGES_PAGE_SIZE), ('wait', 0)):
+        value = args.get(name)
+        if name == 'since' and value is None:
+            value = last_event_id
+        if value is None:
+            parameters[name] = default
+            continue
+        if not value.isdigit():
+            return None, None, None, f"Invalid query parameter: {name}"
+        parameters[name] = int(value)
+
+    if not 0 < parameters['limit'] <= MAX_CHANGES_PAGE_SIZE:
+        return None, None, None, f"Query parameter limit must be between 1 and {MAX_CHANGES_PAGE_SIZE}"
+    if parameters['wait'] > MAX_CHANGES_WAIT_SECONDS:
+        return None, None, None, f"Query parameter wait must be at most {MAX_CHANGES_WAIT_SECONDS}"
+    return parameters['since'], parameters['limit'], parameters['wait'], None
+
+# Checks since against the change log, returns (since to read after, None, None) or (None, body, status)
+# (without since a stream starts at the latest change and a plain request only gets the latest sequence number)
+def resolve_since(since, streaming):
+    oldest_since, latest = db_get_change_bounds()
+    if since is None:
+        if streaming:
+            return latest, None, None
+        return None, {"changes": [], "last_seq": latest}, 200
+
+    # Changes after since were pruned, the consumer has to reload the full state
+    if since < oldest_since:
+        return None, {"error": "Changes since this sequence number are no longer available",
+                      "oldest_since": oldest_since, "last_seq": latest}, 410
+
+    # A sequence number the log never reached (e.g. the database was restored), waiting for it would never end
+    if since > latest:
+        return None, {"error": "Sequence number is ahead of the change log, reload the full state",
+                      "oldest_since": oldest_since, "last_seq": latest}, 410
+    return since, None, None
+
+# Body of a change feed page
+def changes_page(changes, since, limit):
+    return {
+        "changes": changes,
+        "last_seq": changes[-1]['seq'] if changes else since,
+        "has_more": len(changes) == limit
+    }
+
+# Response for a request turned away because all waiter slots are taken
+def _too_many_waiters():
+    response = jsonify({"error": "Too many change feed subscribers, retry later"})
+    response.headers['Retry-After'] = str(CHANGE_FEED_RETRY_AFTER_SECONDS)
+    return response, 503
+
+# GET changes to rooms, room types and room nights with a sequence number greater than since
+# Without since only the latest sequence number is returned (load the full state, then follow from there)
+# Optional: ?limit= page size, ?wait= seconds to long-poll when there are no changes yet,
+# Accept: text/event-stream streams changes as Server-Sent Events (resumes from the Last-Event-ID header)
+# Streams and long-polls beyond CHANGE_FEED_MAX_WAITERS get 503 with Retry-After
+@change_routes.route('', methods=['GET'])
+def get_changes():
+    since, limit, wait, error = parse_changes_args(request.args, request.headers.get('Last-Event-ID'))
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        streaming = request.accept_mimetypes.best == 'text/event-stream'
+        since, body, status = resolve_since(since, streaming)
+        if body is not None:
+            return jsonify(body), status
+
+        if streaming:
+            if not _waiters.acquire(blocking=False):
+                return _too_many_waiters()
+
+            # The slot is freed when the server closes the response, also if the client disconnects early
+            response = Response(_event_stream(since, limit, current_app.json), mimetype='text/event-stream',
+                                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+            response.call_on_close(_waiters.release)
+            return response
+
+        changes = db_get_changes(since, limit)
+        if changes or not wait:
+            return jsonify(changes_page(changes, since, limit)), 200
+        if not _waiters.acquire(blocking=False):
+            return _too_many_waiters()
+
+        # Long-poll: wait for a write, then read again (the generation is taken before reading so no change is missed)
+        try:
+            deadline = time.monotonic() + wait
+            while True:
+                generation = get_change_generation()
+                changes = db_get_changes(since, limit)
+                remaining = deadline - time.monotonic()
+                if changes or remaining <= 0 or not wait_for_change(generation, remaining):
+                    break
+        finally:
+            _waiters.release()
+
+        return jsonify(changes_page(changes, since, limit)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
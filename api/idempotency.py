@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from flask import jsonify, make_response, request
+from api.response_cache import freeze_response, thaw_response
+from repositories.idempotency_repository import (
+    db_begin_idempotent_request,
+    db_complete_idempotent_request,
+    db_count_idempotency_keys,
+    db_delete_idempotent_request,
+    db_get_idempotent_request,
+    db_prune_idempotency_keys,
+)
+
+# Bounds of the idempotency key table (can be overridden with environment variables)
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_KEY_TTL_SECONDS', 24 * 60 * 60))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get('IDEMPOTENCY_MAX_KEYS', 10000))
+
+# Longest accepted Idempotency-Key header value
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Seconds a retry waits for the original request with the same key to finish before getting a 409
+IDEMPOTENCY_WAIT_SECONDS = 30
+
+# Seconds after which a key still in progress is taken over by a retry (its worker died before storing a response)
+IDEMPOTENCY_STALE_SECONDS = 2 * IDEMPOTENCY_WAIT_SECONDS
+
+# Seconds between checks of the table while waiting for a request running in another worker
+IDEMPOTENCY_POLL_SECONDS = 0.05
+
+# Number of new keys between two prunes of expired and surplus keys
+IDEMPOTENCY_PRUNE_INTERVAL = 100
+
+logger = logging.getLogger('room_inventory.idempotency')
+
+# Idempotency keys with the request they were first used for and its response, bounded by count and age
+# Kept in the IdempotencyKeys table so all workers share them; requests of this process also signal an event
+# when they finish, so a concurrent retry in the same worker does not have to poll the table
+class IdempotencyStore:
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._running = {}
+        self._created = 0
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "replays": 0, "mismatches": 0, "expired": 0, "evictions": 0}
+
+    # Converts a table row to a record: its fingerprint, start time and frozen response (None while running)
+    def _record(self, row):
+        response = None
+        if row["status"] is not None:
+            response = {"body": row["body"], "status": row["status"],
+                        "headers": [tuple(header) for header in json.loads(row["headers"])]}
+        return {"fingerprint": row["fingerprint"], "started_at": row["started_at"], "response": response}
+
+    # Drops expired keys and the oldest keys beyond max_entries
+    def _prune(self, now):
+        expired, evicted = db_prune_idempotency_keys(now, self.max_entries)
+        with self._lock:
+            self._stats["expired"] += expired
+            self._stats["evictions"] += evicted
+
+    # Returns (record, created): the record of a known key, or a new in-progress record for the request
+    def begin(self, key, fingerprint):
+        now = time.time()
+        row = db_begin_idempotent_request(key, fingerprint, now, now + self.ttl_seconds, IDEMPOTENCY_STALE_SECONDS)
+        if row is not None:
+            return self._record(row), False
+
+        record = {"fingerprint": fingerprint, "started_at": now, "response": None, "done": threading.Event()}
+        with self._lock:
+            self._running[key] = record["done"]
+            self._created += 1
+            prune = self._created % IDEMPOTENCY_PRUNE_INTERVAL == 1
+        if prune:
+            self._prune(now)
+        return record, True
+
+    # Waits up to timeout seconds for the running request of a key, returns its record (response None if still
+    # running) or None if the key is gone (the request failed with a server error)
+    def wait(self, key, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                done = self._running.get(key)
+            remaining = deadline - time.monotonic()
+            if done is not None:
+                done.wait(max(remaining, 0))
+            row = db_get_idempotent_request(key)
+            if row is None or row["status"] is not None or remaining <= 0:
+                return self._record(row) if row else None
+            if done is None:
+                time.sleep(min(IDEMPOTENCY_POLL_SECONDS, remaining))
+
+    # Stores the response of a key's request; without one (server error) the key is dropped so a retry runs again
+    def complete(self, key, record, frozen):
+        try:
+            if frozen is None:
+                db_delete_idempotent_request(key, record["started_at"])
+            elif db_complete_idempotent_request(key, record["started_at"], frozen["status"],
+                                                json.dumps(frozen["headers"]), frozen["body"]):
+                with self._lock:
+                    self._stats["stored"] += 1
+        except Exception:
+            # The response was already produced, a retry takes the key over after IDEMPOTENCY_STALE_SECONDS
+            logger.exception("Storing the response of an idempotent request failed")
+        finally:
+            with self._lock:
+                if self._running.get(key) is record["done"]:
+                    del self._running[key]
+            record["done"].set()
+
+    # Counts a replayed response or a key reused for another request
+    def record(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    # Returns store metrics (stored responses, replays, mismatches, expired and evicted keys of this process,
+    # keys held by all workers)
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        return {**stats, "keys": db_count_idempotency_keys()}
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_KEY_TTL_SECONDS)
+
+# Makes a mutating route safe to retry: a request with an Idempotency-Key header runs once, retries with the
+# same key and request get the first response again (with Idempotent-Replayed: true) instead of repeating the write
+def idempotent(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify({"error": f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters"}), 400
+
+        # The key may only be reused for the same method, path and body
+        fingerprint = hashlib.sha256(
+            f"{request.method} {request.full_path}\n".encode() + request.get_data()).hexdigest()
+
+        try:
+            while True:
+                record, created = idempotency_store.begin(key, fingerprint)
+                if created:
+                    break
+                if record["fingerprint"] != fingerprint:
+                    idempotency_store.record("mismatches")
+                    return jsonify({"error": "Idempotency-Key was already used for a different request"}), 422
+
+                # Same request still running (a concurrent retry, possibly in another worker): wait for its response
+                if record["response"] is None:
+                    record = idempotency_store.wait(key, IDEMPOTENCY_WAIT_SECONDS)
+                    if record is None or record["fingerprint"] != fingerprint:
+                        # The first request failed with a server error and its key was dropped, so try again
+                        continue
+                    if record["response"] is None:
+                        return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+
+                idempotency_store.record("replays")
+                response = thaw_response(record["response"])
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+        frozen = None
+        try:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code < 500:
+                frozen = freeze_response(response)
+            return response
+        finally:
+            idempotency_store.complete(key, record, frozen)
+    return wrapper
@@ -0,0 +1,46 @@
+import os
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is optional, without it (or with JSON_ENCODER=stdlib) responses are encoded by the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_ENCODER = os.environ.get('JSON_ENCODER', 'orjson' if orjson else 'stdlib')
+
+# Same output as Flask's provider: sorted keys, and dates left to default() so they stay RFC 822 strings
+_ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+# JSON provider encoding with orjson when available, falling back to the stdlib encoder for anything orjson rejects
+class FastJSONProvider(DefaultJSONProvider):
+    def __init__(self, app, encoder=JSON_ENCODER):
+        super().__init__(app)
+        self.use_orjson = encoder == 'orjson' and orjson is not None
+
+    # Serializes to bytes with orjson, or returns None if orjson is disabled or cannot encode the object
+    def _orjson_dumps(self, obj, newline=False):
+        if not self.use_orjson:
+            return None
+        try:
+            options = _ORJSON_OPTIONS | (orjson.OPT_APPEND_NEWLINE if newline else 0)
+            return orjson.dumps(obj, default=self.default, option=options)
+        except TypeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        data = None if kwargs else self._orjson_dumps(obj)
+        return data.decode() if data is not None else super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    # Builds the response body directly from orjson's bytes, pretty-printed debug output uses the stdlib encoder
+    def response(self, *args, **kwargs):
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        data = None if pretty else self._orjson_dumps(self._prepare_response_obj(args, kwargs), newline=True)
+        if data is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data, mimetype=self.mimetype)
@@ -0,0 +1,136 @@
+import threading
+import time
+from flask import Blueprint, Response, g, request
+from api.idempotency import idempotency_store
+from api.response_cache import request_coalescer, response_cache
+from database.connection import pool_stats
+from database.instrumentation import get_totals, start_request_stats
+from database.snapshot import READ_SNAPSHOT_SECONDS, snapshot_stats
+
+# Blueprint for the Prometheus metrics endpoint, also instruments every request of the app
+metrics_routes = Blueprint('metrics', __name__)
+
+# Cumulative histogram with labels in the Prometheus text exposition format
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    # Records a value for a set of labels
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    # Renders all series as exposition lines
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = ",".join(f'{name}="{value}"' for name, value in key)
+                separator = "," if labels else ""
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f'{self.name}_bucket{{{labels}{separator}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels}{separator}le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{labels}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{labels}}} {series["count"]}')
+        return lines
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Wall time per request',
+                             [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5])
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size per request',
+                          [100, 1000, 10000, 100000, 1000000, 10000000])
+REQUEST_STATEMENTS = Histogram('db_statements_per_request', 'SQL statements executed per request',
+                               [0, 1, 2, 3, 5, 10, 25, 50, 100])
+REQUEST_SQL_SECONDS = Histogram('db_sql_seconds_per_request', 'Cumulative SQL execution time per request',
+                                [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1])
+REQUEST_CONNECTIONS = Histogram('db_connections_per_request', 'Pooled connections acquired per request',
+                                [0, 1, 2, 3, 5, 10, 25, 50])
+HISTOGRAMS = [REQUEST_DURATION, RESPONSE_SIZE, REQUEST_STATEMENTS, REQUEST_SQL_SECONDS, REQUEST_CONNECTIONS]
+
+# Starts the request timer and the per-request SQL counters
+@metrics_routes.before_app_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.request_stats = start_request_stats()
+
+# Records wall time, response size and SQL work of the request per route
+@metrics_routes.after_app_request
+def record_request_metrics(response):
+    if 'request_started' not in g:
+        return response
+
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if route == '/metrics':
+        return response
+
+    stats = g.request_stats
+    REQUEST_DURATION.observe(time.perf_counter() - g.request_started,
+                             route=route, method=request.method, status=response.status_code)
+    if response.content_length is not None:
+        RESPONSE_SIZE.observe(response.content_length, route=route, method=request.method)
+    REQUEST_STATEMENTS.observe(stats["statements"], route=route, method=request.method)
+    REQUEST_SQL_SECONDS.observe(stats["sql_seconds"], route=route, method=request.method)
+    REQUEST_CONNECTIONS.observe(stats["connections_acquired"], route=route, method=request.method)
+    return response
+
+# Renders counters and gauges from a dict as exposition lines
+def _render_values(prefix, values, metric_type, description):
+    lines = []
+    for name, value in values.items():
+        lines.append(f"# HELP {prefix}_{name} {description} ({name})")
+        lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+        lines.append(f"{prefix}_{name} {value}")
+    return lines
+
+# GET metrics in the Prometheus text exposition format
+@metrics_routes.route('/metrics', methods=['GET'])
+def get_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+
+    totals = get_totals()
+    lines.extend(_render_values('db', {f"{name}_total": value for name, value in totals.items()},
+                                'counter', 'Database work since start'))
+
+    pool = pool_stats()
+    lines.extend(_render_values('db_pool', {f"{name}_total": pool[name] for name in ('hits', 'misses', 'waits', 'timeouts')},
+                                'counter', 'Connection pool events'))
+    lines.extend(_render_values('db_pool', {name: pool[name] for name in ('size', 'open', 'idle', 'in_use')},
+                                'gauge', 'Connection pool state'))
+
+    cache = response_cache.stats()
+    lines.extend(_render_values('response_cache', {f"{name}_total": cache[name] for name in ('hits', 'misses', 'evictions')},
+                                'counter', 'Response cache events'))
+    lines.extend(_render_values('response_cache', {name: cache[name] for name in ('entries', 'bytes')},
+                                'gauge', 'Response cache state'))
+
+    coalescing = request_coalescer.stats()
+    lines.extend(_render_values('request_coalescing', {f"{name}_total": value for name, value in coalescing.items()},
+                                'counter', 'Identical concurrent GET requests computed once'))
+
+    idempotency = idempotency_store.stats()
+    lines.extend(_render_values('idempotency', {f"{name}_total": idempotency[name]
+                                                for name in ('stored', 'replays', 'mismatches', 'expired', 'evictions')},
+                                'counter', 'Idempotency key events'))
+    lines.extend(_render_values('idempotency', {"keys": idempotency["keys"]}, 'gauge', 'Idempotency key store state'))
+
+    if READ_SNAPSHOT_SECONDS:
+        snapshot = snapshot_stats()
+        lines.extend(_render_values('read_snapshot', {f"{name}_total": snapshot[name] for name in ('refreshes', 'unchanged', 'failures')},
+                                    'counter', 'Read snapshot refreshes'))
+        lines.extend(_render_values('read_snapshot', {"age_seconds": snapshot["age_seconds"]},
+                                    'gauge', 'Read snapshot state'))
+
+    return Response("\n".join(lines) + "\n", mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from flask import Response, make_response, request
+from database.data_versions import get_last_modified
+from database.snapshot import get_read_data_versions
+
+# Bounds for the in-process response cache (can be overridden with environment variables)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 256))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# LRU cache of serialized responses bounded by entry count and total body size
+class ResponseCache:
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    # Returns the entry for key if it was built from the given data versions
+    def get(self, key, versions):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["versions"] != versions:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    # Stores an entry, evicting least recently used entries beyond the bounds
+    def put(self, key, entry):
+        size = len(entry["body"])
+        if size > self.max_bytes // 4:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous["body"])
+            self._entries[key] = entry
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted["body"])
+                self._stats["evictions"] += 1
+
+    # Drops all entries
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    # Returns cache metrics (hits, misses, evictions, entries and bytes held)
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._size}
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES)
+
+# Copy of a finished response that can be handed to other requests (None for streamed responses)
+def freeze_response(response):
+    if response.is_streamed:
+        return None
+    return {"body": response.get_data(), "status": response.status_code, "headers": list(response.headers)}
+
+# Builds a new response from a frozen one
+def thaw_response(frozen):
+    return Response(frozen["body"], status=frozen["status"], headers=frozen["headers"])
+
+# Lets concurrent identical requests share one computation: the first (leader) runs it,
+# the others wait and get a copy of its response
+class RequestCoalescer:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    # Returns the response of produce() for this request, run once for all concurrent callers with the same key
+    def call(self, key, produce):
+        with self._lock:
+            pending = self._calls.get(key)
+            if pending is None:
+                pending = self._calls[key] = {"done": threading.Event(), "frozen": None}
+                self._stats["leaders"] += 1
+                leader = True
+            else:
+                self._stats["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            pending["done"].wait()
+            # Streamed responses and failed leaders cannot be shared, compute separately
+            if pending["frozen"] is None:
+                return produce()
+            return thaw_response(pending["frozen"])
+
+        try:
+            response = produce()
+            pending["frozen"] = freeze_response(response)
+            return response
+        finally:
+            with self._lock:
+                del self._calls[key]
+            pending["done"].set()
+
+    # Returns coalescing metrics (computations run and requests that shared one)
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+request_coalescer = RequestCoalescer()
+
+# Key of the current request for caching and coalescing: the view, path with query string and the negotiated content type
+def _request_key(view):
+    return (view.__name__, request.full_path, request.headers.get('Accept'))
+
+# Coalesces concurrent identical GET requests of an uncached view (e.g. the same price quote) into one computation
+def coalesced_response(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return request_coalescer.call(_request_key(view), lambda: make_response(view(*args, **kwargs)))
+    return wrapper
+
+# Response headers that are rebuilt for every cached response instead of being stored
+_GENERATED_HEADERS = {'content-length', 'content-type', 'etag', 'last-modified', 'cache-control'}
+
+# Builds the response for a cache entry, answering 304 when If-None-Match / If-Modified-Since match
+def _conditional_response(entry):
+    response = Response(entry["body"], status=entry["status"], mimetype=entry["mimetype"], headers=entry["headers"])
+    response.set_etag(entry["etag"])
+    response.last_modified = entry["last_modified"]
+
+    # Clients must revalidate, which is cheap as it never touches the database while data is unchanged
+    response.cache_control.no_cache = True
+
+    # Entries are kept per Accept header, since views like GET /rooms pick their format from it
+    response.vary.add('Accept')
+    return response.make_conditional(request)
+
+# Caches successful GET responses of a view until one of the data sets it reads from changes
+# (keyed on the read snapshot's versions in snapshot mode, pass versions=get_data_versions for views reading the
+# primary database; the ETag is a hash of the body unless the view set its own)
+# Concurrent misses for the same entry, e.g. right after a write invalidated it, are coalesced into one build
+def cached_response(*data_sets, versions=get_read_data_versions):
+    get_versions = versions
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = _request_key(view)
+            versions = get_versions(data_sets)
+
+            entry = response_cache.get(key, versions)
+            if entry is None:
+                last_modified = datetime.fromtimestamp(int(get_last_modified(data_sets)), timezone.utc)
+                response = request_coalescer.call(key + (versions,),
+                                                  lambda: make_response(view(*args, **kwargs)))
+                if response.status_code != 200 or response.is_streamed:
+                    response.vary.add('Accept')
+                    return response
+
+                body = response.get_data()
+                entry = {
+                    "versions": versions,
+                    "body": body,
+                    "status": response.status_code,
+                    "mimetype": response.mimetype,
+                    "headers": [(name, value) for name, value in response.headers
+                                if name.lower() not in _GENERATED_HEADERS],
+                    "etag": response.get_etag()[0] or hashlib.sha1(body).hexdigest(),
+                    "last_modified": last_modified
+                }
+                response_cache.put(key, entry)
+
+            return _conditional_response(entry)
+        return wrapper
+    return decorator
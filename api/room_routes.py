@@ -1,25 +1,84 @@
-from flask import Blueprint, jsonify, request
+from urllib.parse import urlencode
+from flask import Blueprint, Response, jsonify, request
 from repositories.room_repository import (
+    db_allocate_room,
+    db_allocate_rooms,
     db_available_room_of_type,
     db_get_room,
-    db_get_rooms,
+    db_get_rooms_json,
+    db_iter_rooms_json,
     db_update_room_availability,
+    db_update_rooms_availability,
 )
+from repositories.room_night_repository import db_release_room_nights, db_reserve_room_nights
+from api.idempotency import idempotent
+from api.response_cache import cached_response, coalesced_response
+from api.validation import parse_date_range
+from database.data_versions import ROOM_TYPES, ROOMS
 
 # Blueprint for room routes
 room_routes = Blueprint('rooms', __name__)
 
+# Maximum number of rooms that can be allocated in a single bulk request
+MAX_BULK_ALLOCATION = 100
+
+# Maximum number of rooms that can be updated in a single bulk availability request
+MAX_BULK_AVAILABILITY_UPDATES = 1000
+
+# Maximum page size for paginated room listings
+MAX_ROOMS_PAGE_SIZE = 1000
+
+# Query parameters accepted by GET /rooms that must be non-negative integers
+ROOM_LIST_PARAMETERS = ('after_id', 'limit', 'room_type_id', 'availability')
+
+# Maximum number of nights that can be reserved for a room in a single request
+MAX_RESERVED_NIGHTS = 366
+
 # GET all rooms
+# Optional: ?room_type_id=&availability= filters, ?after_id=&limit= keyset pagination,
+# ?format=ndjson (or Accept: application/x-ndjson) streams one room per line
 @room_routes.route('', methods=['GET'])
+@cached_response(ROOMS, ROOM_TYPES)
 def get_rooms():
+    parameters = {}
+    for name in ROOM_LIST_PARAMETERS:
+        value = request.args.get(name)
+        if value is None:
+            continue
+        if not value.isdigit():
+            return jsonify({"error": f"Invalid query parameter: {name}"}), 400
+        parameters[name] = int(value)
+
+    limit = parameters.get('limit')
+    if limit is not None and not 0 < limit <= MAX_ROOMS_PAGE_SIZE:
+        return jsonify({"error": f"Query parameter limit must be between 1 and {MAX_ROOMS_PAGE_SIZE}"}), 400
+
     try:
-        rooms = db_get_rooms()
-        return jsonify(rooms), 200 if rooms else 404
+        # Stream rooms in keyset batches instead of building the whole list in memory
+        streaming = request.args.get('format') == 'ndjson' or \
+            request.accept_mimetypes.best == 'application/x-ndjson'
+        if streaming:
+            rooms = db_iter_rooms_json(**parameters)
+            return Response((room + '\n' for room in rooms), mimetype='application/x-ndjson')
+
+        # The JSON array is built by SQLite, so no dict is created or encoded per room
+        rooms, count, last_id = db_get_rooms_json(**parameters)
+        response = Response(rooms + '\n', mimetype='application/json')
+
+        # Full page means there may be more rooms after the last id
+        if limit is not None and count == limit:
+            next_after_id = last_id
+            query_string = urlencode({**request.args.to_dict(), 'after_id': next_after_id})
+            response.headers['X-Next-After-Id'] = str(next_after_id)
+            response.headers['Link'] = f'<{request.base_url}?{query_string}>; rel="next"'
+
+        return response, 200 if count else 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # GET specific room by id
 @room_routes.route('/<int:room_id>', methods=['GET'])
+@cached_response(ROOMS, ROOM_TYPES)
 def get_room(room_id):
     try:
         room = db_get_room(room_id)
@@ -29,8 +88,9 @@ def get_room(room_id):
 
 # PATCH update room availability
 @room_routes.route('/<int:room_id>/availability', methods=['PATCH'])
+@idempotent
 def update_room_availability(room_id):
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     availability = data.get('availability')
 
     # Check if availability is present and valid
@@ -38,16 +98,116 @@ def update_room_availability(room_id):
         return jsonify({"error": "Invalid or missing field: availability"}), 400
 
     try:
-        db_update_room_availability(room_id, availability)
+        if not db_update_room_availability(room_id, availability):
+            return jsonify({"error": "Room not found"}), 404
         return jsonify({"message": "Room availability updated successfully"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# PATCH update availability of many rooms in one transaction
+# Body: {"updates": [{"room_id": 1, "availability": 0}, ...]}, reports a status per update
+@room_routes.route('/availability', methods=['PATCH'])
+@idempotent
+def update_rooms_availability():
+    data = request.get_json(silent=True)
+    updates = data.get('updates') if isinstance(data, dict) else None
+    if not isinstance(updates, list) or not updates or len(updates) > MAX_BULK_AVAILABILITY_UPDATES:
+        return jsonify({"error": f"Field updates must be a list of 1 to {MAX_BULK_AVAILABILITY_UPDATES} items"}), 400
+
+    # Validate every update before touching the database
+    pairs = []
+    for update in updates:
+        if not isinstance(update, dict):
+            return jsonify({"error": "Every update must be an object"}), 400
+        room_id = update.get('room_id')
+        availability = update.get('availability')
+        if not isinstance(room_id, int) or isinstance(room_id, bool):
+            return jsonify({"error": "Invalid or missing field: room_id"}), 400
+        if availability is None or not isinstance(availability, int):
+            return jsonify({"error": "Invalid or missing field: availability"}), 400
+        pairs.append((room_id, availability))
+
+    try:
+        missing = db_update_rooms_availability(pairs)
+        results = [{"room_id": room_id, "status": "not_found" if room_id in missing else "updated"}
+                   for room_id, _ in pairs]
+        return jsonify({
+            "updated": sum(1 for result in results if result["status"] == "updated"),
+            "not_found": sum(1 for result in results if result["status"] == "not_found"),
+            "results": results
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # GET first available room of specified type
 @room_routes.route('/<int:room_type_id>/available', methods=['GET'])
+@coalesced_response
 def available_room_of_type(room_type_id):
     try:
         room_id = db_available_room_of_type(room_type_id)
         return jsonify({"room_id": room_id}), 200 if room_id else 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+# POST allocate first available room of specified type (read and update in one transaction)
+@room_routes.route('/<int:room_type_id>/allocate', methods=['POST'])
+@idempotent
+def allocate_room_of_type(room_type_id):
+    try:
+        room_id = db_allocate_room(room_type_id)
+        if room_id is None:
+            return jsonify({"error": "No available rooms found"}), 404
+        return jsonify({"room_id": room_id}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# POST allocate several rooms of specified type at once (all or nothing)
+@room_routes.route('/<int:room_type_id>/allocate/bulk', methods=['POST'])
+@idempotent
+def allocate_rooms_of_type(room_type_id):
+    data = request.get_json(silent=True) or {}
+    count = data.get('count')
+
+    # Check if count is present and valid
+    if not isinstance(count, int) or isinstance(count, bool) or not 0 < count <= MAX_BULK_ALLOCATION:
+        return jsonify({"error": f"Invalid or missing field: count (1-{MAX_BULK_ALLOCATION})"}), 400
+
+    try:
+        room_ids = db_allocate_rooms(room_type_id, count)
+        if not room_ids:
+            return jsonify({"error": "Not enough available rooms"}), 409
+        return jsonify({"room_ids": room_ids}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# POST mark a room as occupied for every night from start_date up to (not including) end_date
+@room_routes.route('/<int:room_id>/nights', methods=['POST'])
+@idempotent
+def reserve_room_nights(room_id):
+    start_date, end_date, error = parse_date_range(request.get_json(silent=True) or {}, 1, MAX_RESERVED_NIGHTS)
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        reserved = db_reserve_room_nights(room_id, start_date, end_date)
+        if reserved is None:
+            return jsonify({"error": "Room not found"}), 404
+        if not reserved:
+            return jsonify({"error": "Room is already occupied for some of these nights"}), 409
+        return jsonify({"message": "Room nights reserved successfully"}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# DELETE free the nights of a room from start_date up to (not including) end_date
+@room_routes.route('/<int:room_id>/nights', methods=['DELETE'])
+@idempotent
+def release_room_nights(room_id):
+    start_date, end_date, error = parse_date_range(request.args, 1, MAX_RESERVED_NIGHTS)
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        released = db_release_room_nights(room_id, start_date, end_date)
+        return jsonify({"released_nights": released}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
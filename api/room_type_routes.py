@@ -1,17 +1,41 @@
-from flask import Blueprint, jsonify, request
+import sqlite3
+from flask import Blueprint, Response, jsonify, request
 from repositories.room_type_repository import (
     db_add_room_type,
     db_get_room_type,
     db_get_room_types,
-    db_get_room_types_with_availability,
+    db_get_room_types_with_availability_json,
     db_update_room_type_price,
+    db_update_room_type_prices,
 )
+from repositories.room_night_repository import db_get_room_types_availability_for_range
+from api.idempotency import idempotent
+from api.response_cache import cached_response
+from api.validation import parse_date_range
+from database.data_versions import ROOM_NIGHTS, ROOM_TYPES, ROOMS, get_data_versions
+from database.snapshot import get_read_data_versions
 
 # Blueprint for room type routes
 room_type_routes = Blueprint('room_types', __name__)
 
+# Maximum number of room type prices that can be updated in a single bulk request
+MAX_BULK_PRICE_UPDATES = 100
+
+# ETag of a room type version, sent by clients in If-Match for conditional updates
+def _version_etag(version):
+    return f"v{version}"
+
+# Checks that a value is a usable price (a non-negative number, booleans excluded)
+def _is_valid_price(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+
+# Checks that a value is a usable expected version (a positive integer or None, booleans excluded)
+def _is_valid_version(value):
+    return value is None or (isinstance(value, int) and not isinstance(value, bool) and value > 0)
+
 # GET all room types
 @room_type_routes.route('', methods=['GET'])
+@cached_response(ROOM_TYPES)
 def get_room_types():
     try:
         room_types = db_get_room_types()
@@ -19,28 +43,53 @@ def get_room_types():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Cache versions of the availability view: ranged lookups read room nights on the primary database,
+# so they must follow its versions, not the read snapshot's
+def _availability_data_versions(data_sets):
+    if 'start_date' in request.args or 'end_date' in request.args:
+        return get_data_versions(data_sets)
+    return get_read_data_versions(data_sets)
+
 # GET all room types with availability
+# With ?start_date=&end_date= (YYYY-MM-DD, end date exclusive) counts rooms free for every night of that stay
 @room_type_routes.route('/availability', methods=['GET'])
+@cached_response(ROOM_TYPES, ROOMS, ROOM_NIGHTS, versions=_availability_data_versions)
 def get_room_types_with_availability():
     try:
-        room_types = db_get_room_types_with_availability()
-        return jsonify(room_types), 200 if room_types else 404
+        if 'start_date' in request.args or 'end_date' in request.args:
+            start_date_dt, end_date_dt, error = parse_date_range(request.args, min_days=1)
+            if error:
+                return jsonify({"error": error}), 400
+            room_types = db_get_room_types_availability_for_range(start_date_dt, end_date_dt)
+            return jsonify(room_types), 200 if room_types else 404
+
+        # The JSON array is built by SQLite from the availability counters
+        room_types, count = db_get_room_types_with_availability_json()
+        return Response(room_types + '\n', mimetype='application/json'), 200 if count else 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # GET specific room type by id
 @room_type_routes.route('/<int:room_type_id>', methods=['GET'])
+@cached_response(ROOM_TYPES)
 def get_room_type(room_type_id):
     try:
         room_type = db_get_room_type(room_type_id)
-        return jsonify(room_type), 200 if room_type else 404
+        if not room_type:
+            return jsonify(room_type), 404
+
+        # The ETag is the row version, so it can be sent back in If-Match when updating the price
+        response = jsonify(room_type)
+        response.set_etag(_version_etag(room_type['version']))
+        return response, 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# POST add new room type
+# POST add new room type (409 if the type name exists, send an Idempotency-Key to make retries safe)
 @room_type_routes.route('', methods=['POST'])
+@idempotent
 def add_room_type():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     required_fields = ['type_name', 'base_price', 'max_count']
     
     # Check if all required fields are present and valid
@@ -50,21 +99,86 @@ def add_room_type():
     try:
         db_add_room_type(data['type_name'], data['base_price'], data['max_count'])
         return jsonify({"message": "Room type added successfully"}), 201
+    except sqlite3.IntegrityError as e:
+        if 'UNIQUE' in str(e):
+            return jsonify({"error": "Room type already exists"}), 409
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 # PATCH update room type price
+# Optional compare-and-set: If-Match: "v{version}" header or "expected_version" in the body, 412 if it changed
 @room_type_routes.route('/<int:room_type_id>/price', methods=['PATCH'])
+@idempotent
 def update_room_type_price(room_type_id):
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     base_price = data.get('base_price')
-    
-    # Check if base_price is present and valid
-    if base_price is None or not isinstance(base_price, (int, float)):
+    expected_version = data.get('expected_version')
+
+    # Check if base_price and expected_version are present and valid
+    if not _is_valid_price(base_price):
         return jsonify({"error": "Invalid or missing field: base_price"}), 400
+    if not _is_valid_version(expected_version):
+        return jsonify({"error": "Invalid field: expected_version"}), 400
+
+    # If-Match carries the ETag of GET /room_types/<id>, "*" only requires the room type to exist
+    if request.if_match and not request.if_match.star_tag:
+        tags = request.if_match.as_set()
+        tag = tags.pop() if len(tags) == 1 else ''
+        if not tag.startswith('v') or not tag[1:].isdigit():
+            return jsonify({"error": "If-Match must contain a single room type version ETag"}), 400
+        if expected_version is not None and expected_version != int(tag[1:]):
+            return jsonify({"error": "If-Match and expected_version do not match"}), 400
+        expected_version = int(tag[1:])
 
     try:
-        db_update_room_type_price(room_type_id, base_price)
-        return jsonify({"message": "Room type price updated successfully"}), 200
+        version, current_version = db_update_room_type_price(room_type_id, base_price, expected_version)
+        if current_version is None:
+            return jsonify({"error": "Room type not found"}), 404
+        if version is None:
+            return jsonify({"error": "Room type was modified, reload it and retry", "version": current_version}), 412
+
+        response = jsonify({"message": "Room type price updated successfully", "version": version})
+        response.set_etag(_version_etag(version))
+        return response, 200
     except Exception as e:
         return jsonify({"error": str(e)}), 400
+
+# PATCH update the prices of many room types in one transaction (all or nothing)
+# Body: {"prices": [{"room_type_id": 1, "base_price": 950.0, "expected_version": 3}, ...]}, expected_version optional
+@room_type_routes.route('/prices', methods=['PATCH'])
+@idempotent
+def update_room_type_prices():
+    data = request.get_json(silent=True)
+    items = data.get('prices') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items or len(items) > MAX_BULK_PRICE_UPDATES:
+        return jsonify({"error": f"Field prices must be a list of 1 to {MAX_BULK_PRICE_UPDATES} items"}), 400
+
+    # Validate every price before touching the database
+    prices = []
+    for item in items:
+        if not isinstance(item, dict):
+            return jsonify({"error": "Every price must be an object"}), 400
+        room_type_id = item.get('room_type_id')
+        if not isinstance(room_type_id, int) or isinstance(room_type_id, bool):
+            return jsonify({"error": "Invalid or missing field: room_type_id"}), 400
+        if not _is_valid_price(item.get('base_price')):
+            return jsonify({"error": "Invalid or missing field: base_price"}), 400
+        if not _is_valid_version(item.get('expected_version')):
+            return jsonify({"error": "Invalid field: expected_version"}), 400
+        prices.append((room_type_id, item['base_price'], item.get('expected_version')))
+
+    if len({room_type_id for room_type_id, _, _ in prices}) != len(prices):
+        return jsonify({"error": "Every room_type_id may only appear once"}), 400
+
+    try:
+        versions, conflicts = db_update_room_type_prices(prices)
+        if conflicts:
+            return jsonify({"error": "No prices were updated", "conflicts": conflicts}), 409
+        return jsonify({
+            "message": "Room type prices updated successfully",
+            "updated": [{"room_type_id": room_type_id, "version": versions[room_type_id]}
+                        for room_type_id, _, _ in prices]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,29 @@
+import os
+from datetime import datetime
+
+# Longest stay (days between start_date and end_date) accepted by pricing endpoints
+MAX_STAY_DAYS = int(os.environ.get('MAX_STAY_DAYS', 366))
+
+# Parses start_date/end_date (YYYY-MM-DD) from a dict and checks min_days <= end - start <= max_days
+# Returns (start_date, end_date, error); runs before any database access
+def parse_date_range(values, min_days=0, max_days=MAX_STAY_DAYS,
+                     missing_error="Missing field: start_date or end_date"):
+    start_date = values.get('start_date')
+    end_date = values.get('end_date')
+    if not start_date or not end_date:
+        return None, None, missing_error
+
+    try:
+        start_date_dt = datetime.strptime(start_date, "%Y-%m-%d")
+        end_date_dt = datetime.strptime(end_date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None, None, "Invalid date format, expected YYYY-MM-DD"
+
+    days = (end_date_dt - start_date_dt).days
+    if days < min_days:
+        if min_days == 0:
+            return None, None, "end_date must not be before start_date"
+        return None, None, "end_date must be after start_date"
+    if days > max_days:
+        return None, None, f"end_date must be at most {max_days} days after start_date"
+    return start_date_dt, end_date_dt, None
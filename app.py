@@ -1,27 +1,76 @@
+import time
+
+# Startup timing report (import time, init_db time, time to first request)
+_started = time.perf_counter()
+STARTUP_TIMINGS = {}
+
 from flask import Flask, jsonify
+from database.change_log import start_change_log_pruner
 from database.initialization import init_db
+from database.instrumentation import get_request_stats
 from api.room_routes import room_routes
 from api.room_type_routes import room_type_routes
 from api.calculate_price_routes import calculate_price_routes
+from api.change_routes import change_routes
+from api.analytics_routes import analytics_routes
+from api.metrics_routes import metrics_routes
+from api.json_provider import FastJSONProvider
+
+# Creates the Flask application with all blueprints and error handlers (does not touch the database)
+def create_app():
+    app = Flask(__name__)
+
+    # Encode JSON responses with orjson when it is installed
+    app.json = FastJSONProvider(app)
+
+    # Register blueprints for modular endpoints
+    app.register_blueprint(room_routes, url_prefix='/api/v1/rooms')
+    app.register_blueprint(room_type_routes, url_prefix='/api/v1/room_types')
+    app.register_blueprint(calculate_price_routes, url_prefix='/api/v1/calculate_price')
+    app.register_blueprint(change_routes, url_prefix='/api/v1/changes')
+    app.register_blueprint(analytics_routes, url_prefix='/api/v1/analytics')
+
+    # Register metrics endpoint and per-request timing/SQL instrumentation
+    app.register_blueprint(metrics_routes)
+
+    # Bound the change log while the process runs, not only at startup (the first prune is after one interval)
+    start_change_log_pruner()
+
+    # Records and prints the time from application import to the first handled request
+    @app.before_request
+    def record_first_request():
+        if 'first_request_seconds' not in STARTUP_TIMINGS:
+            STARTUP_TIMINGS['first_request_seconds'] = time.perf_counter() - _started
+            print("Startup timings: " + ", ".join(f"{name}={seconds:.3f}s" for name, seconds in STARTUP_TIMINGS.items()))
+
+    # Tells clients how many seconds stale the snapshot data of the response may be (READ_SNAPSHOT_SECONDS only)
+    @app.after_request
+    def add_snapshot_age(response):
+        stats = get_request_stats()
+        if stats is not None and stats["snapshot_taken_at"] is not None:
+            response.headers['X-Snapshot-Age'] = f"{max(time.time() - stats['snapshot_taken_at'], 0):.3f}"
+        return response
+
+    # Error handler for 404 Not Found
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({"error": "Endpoint not found"}), 404
 
-app = Flask(__name__)
+    # Error handler for 500 Internal Server Error
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({"error": "Internal server error"}), 500
 
-# Register blueprints for modular endpoints
-app.register_blueprint(room_routes, url_prefix='/api/v1/rooms')
-app.register_blueprint(room_type_routes, url_prefix='/api/v1/room_types')
-app.register_blueprint(calculate_price_routes, url_prefix='/api/v1/calculate_price')
+    return app
 
-# Error handler for 404 Not Found
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({"error": "Endpoint not found"}), 404
+app = create_app()
 
-# Error handler for 500 Internal Server Error
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({"error": "Internal server error"}), 500
+STARTUP_TIMINGS['import_seconds'] = time.perf_counter() - _started
 
-# Initializes database and runs Flask app on port 5002
+# Initializes database and runs the single-process development server on port 5002
+# (production: gunicorn --config gunicorn.conf.py, see README)
 if __name__ == '__main__':
+    init_started = time.perf_counter()
     init_db()
+    STARTUP_TIMINGS['init_db_seconds'] = time.perf_counter() - init_started
     app.run(host='0.0.0.0', port=5002)
@@ -0,0 +1,14 @@
+import os
+from a2wsgi import WSGIMiddleware
+from api.async_change_routes import AsyncChangeFeed
+from app import create_app
+from database.connection import POOL_SIZE
+
+# Threads running requests in the ASGI server (can be overridden with ASGI_THREADS), at most one pooled connection each
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', POOL_SIZE))
+
+# ASGI entry point (SERVER_MODE=async): the event loop holds client connections, idle keep-alive connections cost
+# no thread, and requests run the same Flask app on a bounded pool of ASGI_THREADS threads
+# Change feed event streams and long-polls wait on the event loop instead, so subscribers cannot use up the threads
+flask_app = create_app()
+app = AsyncChangeFeed(flask_app, WSGIMiddleware(flask_app, workers=ASGI_THREADS))
@@ -0,0 +1,68 @@
+import argparse
+import threading
+import time
+from collections import Counter
+from benchmarks.common import remove_temporary_database, use_temporary_database
+from database.connection import get_connection
+from repositories.room_repository import db_allocate_room, db_allocate_rooms
+
+# Counts available rooms of a type directly in the database
+def _available_count(room_type_id):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT COUNT(*) count FROM Rooms WHERE room_type_id = ? AND availability = 1', (room_type_id,))
+        return cursor.fetchone()['count']
+
+# Hammers the allocation path from many threads and checks that no room is handed out twice
+def run(threads, room_type_id, bulk_size):
+    path = use_temporary_database()
+    try:
+        available_before = _available_count(room_type_id)
+        allocated = []
+        allocated_lock = threading.Lock()
+        start_barrier = threading.Barrier(threads)
+
+        def worker():
+            start_barrier.wait()
+            while True:
+                if bulk_size > 1:
+                    room_ids = db_allocate_rooms(room_type_id, bulk_size)
+                    if not room_ids:
+                        # Fewer rooms left than the bulk size, drain the rest one by one
+                        room_id = db_allocate_room(room_type_id)
+                        room_ids = [room_id] if room_id else []
+                else:
+                    room_id = db_allocate_room(room_type_id)
+                    room_ids = [room_id] if room_id else []
+                if not room_ids:
+                    return
+                with allocated_lock:
+                    allocated.extend(room_ids)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        duplicates = [room_id for room_id, count in Counter(allocated).items() if count > 1]
+        print(f"threads={threads} bulk_size={bulk_size} available_before={available_before} "
+              f"allocated={len(allocated)} available_after={_available_count(room_type_id)} "
+              f"duplicates={len(duplicates)} elapsed={elapsed:.3f}s")
+
+        assert not duplicates, f"Rooms allocated more than once: {duplicates}"
+        assert len(allocated) == available_before, "Allocated rooms do not match rooms that were available"
+        assert _available_count(room_type_id) == 0, "Rooms left available after draining the type"
+        print("OK: no double allocation")
+    finally:
+        remove_temporary_database(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrency stress test for room allocation')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--room-type-id', type=int, default=1)
+    parser.add_argument('--bulk-size', type=int, default=1)
+    args = parser.parse_args()
+    run(args.threads, args.room_type_id, args.bulk_size)
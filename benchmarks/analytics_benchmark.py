@@ -0,0 +1,60 @@
+import argparse
+import statistics
+import time
+from benchmarks.common import remove_temporary_database, seed_synthetic_bookings, use_temporary_database
+
+# (name, path) of the analytics endpoints measured
+SCENARIOS = [
+    ('revenue by room type and season', '/api/v1/analytics/revenue'),
+    ('revenue by room type', '/api/v1/analytics/revenue?group_by=room_type'),
+    ('revenue of one room type', '/api/v1/analytics/revenue?room_type_id=3&group_by=season'),
+    ('occupancy by room type and season', '/api/v1/analytics/occupancy?year=2024'),
+]
+
+# Returns the median milliseconds of runs calls
+def _median_ms(call, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+# Seeds millions of bookings and times every analytics endpoint uncached and cached
+def run(bookings, runs):
+    path = use_temporary_database()
+    try:
+        started = time.perf_counter()
+        seed_synthetic_bookings(bookings)
+        print(f"seeded bookings={bookings:,} in {time.perf_counter() - started:.1f}s")
+
+        from api.response_cache import response_cache
+        from app import create_app
+        client = create_app().test_client()
+
+        for name, url in SCENARIOS:
+            response_cache.max_entries = 0
+            uncached = _median_ms(lambda: client.get(url), runs)
+            response_cache.max_entries = 256
+            client.get(url)
+            cached = _median_ms(lambda: client.get(url), runs * 10)
+            print(f"{name:<36} uncached={uncached:>9.1f}ms cached={cached:>7.3f}ms")
+
+        # Same aggregate done in pandas after loading the bookings, for reference
+        import pandas as pd
+        from database.connection import get_connection
+
+        def pandas_aggregate():
+            with get_connection() as connection:
+                frame = pd.read_sql('SELECT room_type_id, season_id, nights, price_ore FROM Bookings', connection)
+            return frame.groupby(['room_type_id', 'season_id']).agg(nights=('nights', 'sum'), revenue=('price_ore', 'sum'))
+        print(f"{'pandas read_sql + groupby (reference)':<36} uncached={_median_ms(pandas_aggregate, runs):>9.1f}ms")
+    finally:
+        remove_temporary_database(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the analytics endpoints on millions of bookings')
+    parser.add_argument('--bookings', type=int, default=2000000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    run(args.bookings, args.runs)
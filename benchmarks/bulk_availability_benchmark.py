@@ -0,0 +1,44 @@
+import argparse
+import random
+import time
+from benchmarks.common import remove_temporary_database, seed_synthetic_rooms, use_temporary_database
+
+# Flips availability of updates rooms one PATCH per room and with bulk PATCHes of batch_size rooms
+def run(rooms, updates, batch_size):
+    path = use_temporary_database()
+    try:
+        seed_synthetic_rooms(rooms)
+        from app import create_app
+        client = create_app().test_client()
+
+        generator = random.Random(7)
+        pairs = [(generator.randint(1, rooms), generator.randint(0, 1)) for _ in range(updates)]
+
+        started = time.perf_counter()
+        for room_id, availability in pairs:
+            response = client.patch(f'/api/v1/rooms/{room_id}/availability', json={"availability": availability})
+            assert response.status_code == 200, response.get_json()
+        per_room = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for offset in range(0, len(pairs), batch_size):
+            body = {"updates": [{"room_id": room_id, "availability": availability}
+                                for room_id, availability in pairs[offset:offset + batch_size]]}
+            response = client.patch('/api/v1/rooms/availability', json=body)
+            assert response.status_code == 200 and response.get_json()["not_found"] == 0, response.get_json()
+        bulk = time.perf_counter() - started
+
+        print(f"rooms={rooms} updates={updates}")
+        print(f"per-room PATCH:        {per_room * 1000:>9.1f}ms {updates / per_room:>10,.0f} updates/s")
+        print(f"bulk PATCH (batch {batch_size:>4}): {bulk * 1000:>9.1f}ms {updates / bulk:>10,.0f} updates/s "
+              f"({per_room / bulk:.1f}x)")
+    finally:
+        remove_temporary_database(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark per-room against bulk availability updates')
+    parser.add_argument('--rooms', type=int, default=5000)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+    run(args.rooms, args.updates, args.batch_size)
@@ -0,0 +1,113 @@
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from database.connection import close_pool, get_connection, set_database_path
+from database.constants import ROOM_COUNTS
+from database.idempotency_database import close_idempotency_pool
+from database.initialization import init_db
+
+# Points the service at a fresh, seeded database in a temporary directory and returns its path
+def use_temporary_database():
+    directory = tempfile.mkdtemp(prefix='room_inventory_')
+    path = os.path.join(directory, 'room_inventory.db')
+    set_database_path(path)
+    init_db()
+    return path
+
+# Closes pooled connections and removes a temporary database created by use_temporary_database
+def remove_temporary_database(path):
+    close_pool()
+    close_idempotency_pool()
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+# Adds rooms (spread over the room types like ROOM_COUNTS) until the inventory holds total_rooms rooms
+def seed_synthetic_rooms(total_rooms, seed=42):
+    generator = random.Random(seed)
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT id, type_name FROM RoomTypes')
+        type_ids = {row['type_name']: row['id'] for row in cursor.fetchall()}
+        cursor.execute('SELECT COUNT(*) count FROM Rooms')
+        missing = total_rooms - cursor.fetchone()['count']
+        if missing <= 0:
+            return
+
+        type_names = list(ROOM_COUNTS)
+        weights = [ROOM_COUNTS[name] for name in type_names]
+        rows = [(type_ids[name], int(generator.random() < 0.8))
+                for name in generator.choices(type_names, weights, k=missing)]
+        cursor.executemany('INSERT INTO Rooms (room_type_id, availability) VALUES (?, ?)', rows)
+        connection.commit()
+
+# Books random stays so that roughly occupancy of all room nights from first_night on are occupied
+def seed_synthetic_room_nights(nights, occupancy, first_night=date(2025, 1, 1), seed=42):
+    generator = random.Random(seed)
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT id FROM Rooms')
+        room_ids = [row['id'] for row in cursor.fetchall()]
+
+        rows = []
+        for room_id in room_ids:
+            day = 0
+            while day < nights:
+                length = generator.randint(1, 7)
+                if generator.random() < occupancy:
+                    rows.extend((room_id, (first_night + timedelta(days=offset)).isoformat())
+                                for offset in range(day, min(day + length, nights)))
+                day += length
+        cursor.executemany('INSERT INTO RoomNights (room_id, night) VALUES (?, ?)', rows)
+        connection.commit()
+        return len(rows)
+
+# Adds synthetic historical bookings (room type spread like ROOM_COUNTS, 1-10 nights) until there are total_bookings
+def seed_synthetic_bookings(total_bookings, seed=42, batch_size=500000):
+    generator = random.Random(seed)
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT id, type_name, base_price FROM RoomTypes')
+        room_types = {row['type_name']: (row['id'], row['base_price']) for row in cursor.fetchall()}
+        cursor.execute('SELECT id, multiplier FROM Seasons')
+        seasons = [(row['id'], row['multiplier']) for row in cursor.fetchall()]
+        cursor.execute('SELECT COUNT(*) count FROM Bookings')
+        missing = total_bookings - cursor.fetchone()['count']
+
+        type_names = list(ROOM_COUNTS)
+        weights = [ROOM_COUNTS[name] for name in type_names]
+        while missing > 0:
+            count = min(missing, batch_size)
+            rows = []
+            for name in generator.choices(type_names, weights, k=count):
+                room_type_id, base_price = room_types[name]
+                season_id, multiplier = generator.choice(seasons)
+                nights = generator.randint(1, 10)
+                rows.append((room_type_id, season_id, nights, round(base_price * multiplier * nights * 100)))
+            cursor.executemany('INSERT INTO Bookings (room_type_id, season_id, nights, price_ore) VALUES (?, ?, ?, ?)',
+                               rows)
+            missing -= count
+        connection.commit()
+
+# Starts gunicorn with the given number of workers (and extra environment variables) and waits until it answers
+# on port; the caller must terminate() the returned process
+def start_server(database_path, workers, threads, port, **settings):
+    import requests
+
+    environment = {**os.environ, 'ROOM_INVENTORY_DB': database_path, 'WEB_CONCURRENCY': str(workers),
+                   'WEB_THREADS': str(threads), 'PORT': str(port), **settings}
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+                              env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            requests.get(f'http://127.0.0.1:{port}/api/v1/room_types', timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('Server did not start')
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.common import remove_temporary_database, start_server, use_temporary_database
+
+# Endpoint requested on every connection
+PATH = '/api/v1/room_types/3'
+
+# Sends one keep-alive GET on an open connection and reads the whole response, returns the status code
+async def _request(reader, writer, timeout):
+    writer.write(f'GET {PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'.encode())
+    await writer.drain()
+    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+    lines = head.decode('latin-1').split('\r\n')
+    length = next((int(line.split(':', 1)[1]) for line in lines if line.lower().startswith('content-length:')), 0)
+    await asyncio.wait_for(reader.readexactly(length), timeout)
+    return int(lines[0].split()[1])
+
+# Opens a connection, makes a request, stays idle, then makes a second request on the same connection
+async def _client(port, idle, timeout, results, index, spread):
+    await asyncio.sleep(spread * index)
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        results['connect_failed'] += 1
+        return
+    round_name = 'first'
+    try:
+        for round_name in ('first', 'after_idle'):
+            started = time.perf_counter()
+            status = await _request(reader, writer, timeout)
+            results[f'{round_name}_ok' if status == 200 else f'{round_name}_failed'] += 1
+            results[f'{round_name}_latencies'].append(time.perf_counter() - started)
+            if round_name == 'first':
+                await asyncio.sleep(idle)
+    except (OSError, EOFError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+        results[f'{round_name}_failed'] += 1
+    finally:
+        writer.close()
+
+# Returns the number of threads and resident memory (KiB) of a process and all of its children
+def _process_tree_usage(pid):
+    threads = 0
+    rss = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f'/proc/{current}/status') as status_file:
+                for line in status_file:
+                    if line.startswith('Threads:'):
+                        threads += int(line.split()[1])
+                    elif line.startswith('VmRSS:'):
+                        rss += int(line.split()[1])
+            with open(f'/proc/{current}/task/{current}/children') as children_file:
+                pids.extend(int(child) for child in children_file.read().split())
+        except FileNotFoundError:
+            continue
+    return threads, rss
+
+# Holds keep-alive connections against the server and reports how many were served before and after idling
+async def _drive(server, port, connections, idle, timeout, ramp):
+    results = {'connect_failed': 0, 'first_ok': 0, 'first_failed': 0, 'after_idle_ok': 0, 'after_idle_failed': 0,
+               'first_latencies': [], 'after_idle_latencies': []}
+    clients = [asyncio.ensure_future(_client(port, idle, timeout, results, index, ramp / connections))
+               for index in range(connections)]
+
+    # Sample server threads and memory while the connections are idle
+    await asyncio.sleep(ramp + min(idle / 2, 5))
+    threads, rss = _process_tree_usage(server.pid)
+    await asyncio.gather(*clients)
+    return results, threads, rss
+
+# Compares how many mostly-idle keep-alive connections the sync and async server modes can hold and serve
+def run(modes, connections, idle, timeout, ramp, workers, threads, port):
+    database_path = use_temporary_database()
+    try:
+        for mode in modes:
+            server = start_server(database_path, workers, threads, port, SERVER_MODE=mode,
+                                   WEB_KEEPALIVE=str(int(idle + timeout)))
+            try:
+                results, server_threads, rss = asyncio.run(_drive(server, port, connections, idle, timeout, ramp))
+            finally:
+                server.terminate()
+                server.wait()
+
+            latencies = sorted(results['after_idle_latencies']) or [0]
+            print(f"mode={mode:<5} connections={connections} idle={idle:.0f}s: "
+                  f"served first={results['first_ok']} after idle={results['after_idle_ok']} "
+                  f"failed={results['connect_failed'] + results['first_failed'] + results['after_idle_failed']} "
+                  f"p99 after idle={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms "
+                  f"server threads={server_threads} rss={rss / 1024:.0f}MiB")
+    finally:
+        remove_temporary_database(database_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare idle keep-alive connection capacity of the server modes')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'async'])
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--idle', type=float, default=10.0, help='seconds each connection stays idle between requests')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds to wait for a response')
+    parser.add_argument('--ramp', type=float, default=5.0, help='seconds over which connections are opened')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5098)
+    args = parser.parse_args()
+    run(args.modes, args.connections, args.idle, args.timeout, args.ramp, args.workers, args.threads, args.port)
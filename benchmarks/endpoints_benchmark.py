@@ -0,0 +1,240 @@
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from api.validation import MAX_STAY_DAYS
+from benchmarks.common import (
+    remove_temporary_database,
+    seed_synthetic_bookings,
+    seed_synthetic_rooms,
+    use_temporary_database,
+)
+
+# Allocates a room of a type (cycling through the types) and frees it again, so allocations never run out
+def _allocate_and_release(send, n):
+    status, data = send('POST', f'/api/v1/rooms/{n % 8 + 1}/allocate', None)
+    if status == 200:
+        send('PATCH', f'/api/v1/rooms/{data["room_id"]}/availability', {"availability": 1})
+    return status
+
+# Allocates 3 rooms of a type at once and frees them again with one bulk update
+def _allocate_bulk_and_release(send, n):
+    status, data = send('POST', f'/api/v1/rooms/{n % 8 + 1}/allocate/bulk', {"count": 3})
+    if status == 200:
+        send('PATCH', '/api/v1/rooms/availability',
+             {"updates": [{"room_id": room_id, "availability": 1} for room_id in data["room_ids"]]})
+    return status
+
+# Reserves a week of nights, every request another room and week so none of them conflict
+def _reserve_room_nights(send, n):
+    start_date = date(2030, 1, 7) + timedelta(weeks=n // 200)
+    return send('POST', f'/api/v1/rooms/{n % 200 + 1}/nights',
+                {"start_date": start_date.isoformat(), "end_date": (start_date + timedelta(days=7)).isoformat()})[0]
+
+# Reserves and frees the same nights, the two writes of a booking that is cancelled
+def _reserve_and_free_room_nights(send, n):
+    room_id = n % 200 + 1
+    status, _ = send('POST', f'/api/v1/rooms/{room_id}/nights', {"start_date": "2031-03-01", "end_date": "2031-03-04"})
+    send('DELETE', f'/api/v1/rooms/{room_id}/nights?start_date=2031-03-01&end_date=2031-03-04', None)
+    return status
+
+# Price update with a new Idempotency-Key per request (the key is stored with the response)
+def _update_price_new_key(send, n):
+    return send('PATCH', '/api/v1/room_types/5/price', {"base_price": 1500.0 + n % 100},
+                {'Idempotency-Key': f'benchmark-price-{n}'})[0]
+
+# Retry of a price update whose Idempotency-Key was used before, answered from the stored response
+def _update_price_replay(send, n):
+    return send('PATCH', '/api/v1/room_types/5/price', {"base_price": 1500.0},
+                {'Idempotency-Key': 'benchmark-price-replay'})[0]
+
+# (name, method, path, JSON body) for every endpoint of every blueprint, or (name, function(send, n) -> status)
+# for requests that must differ between runs (e.g. writes that would conflict if repeated); n numbers the requests
+SCENARIOS = [
+    ('room_types', 'GET', '/api/v1/room_types', None),
+    ('room_type', 'GET', '/api/v1/room_types/3', None),
+    ('room_types_availability', 'GET', '/api/v1/room_types/availability', None),
+    ('room_types_availability_range', 'GET', '/api/v1/room_types/availability?start_date=2025-03-01&end_date=2025-03-08', None),
+    ('rooms', 'GET', '/api/v1/rooms', None),
+    ('rooms_page', 'GET', '/api/v1/rooms?room_type_id=2&after_id=100&limit=100', None),
+    ('room', 'GET', '/api/v1/rooms/42', None),
+    ('available_room_of_type', 'GET', '/api/v1/rooms/4/available', None),
+    ('update_room_availability', 'PATCH', '/api/v1/rooms/42/availability', {"availability": 1}),
+    ('update_rooms_availability_bulk', 'PATCH', '/api/v1/rooms/availability',
+     {"updates": [{"room_id": room_id, "availability": 1} for room_id in range(1, 101)]}),
+    ('season_type', 'GET', '/api/v1/calculate_price/season_type/2', None),
+    ('price_short_stay', 'GET', '/api/v1/calculate_price/3?start_date=2024-12-20&end_date=2024-12-23', None),
+    ('price_long_stay_worst_case', 'GET', '/api/v1/calculate_price/8?start_date={first_day}&end_date={last_day}', None),
+    ('price_batch_all_types', 'POST', '/api/v1/calculate_price/batch', {"start_date": "2024-06-01", "end_date": "2024-08-31"}),
+    ('price_grid_year', 'GET', '/api/v1/calculate_price/grid?start=2024-11-01&days=365&compact=true', None),
+    ('price_grid_year_rows', 'GET', '/api/v1/calculate_price/grid?start=2024-11-01&days=365', None),
+    ('changes_latest', 'GET', '/api/v1/changes', None),
+    ('changes_page', 'GET', '/api/v1/changes?since={first_change}&limit=100', None),
+    ('analytics_revenue', 'GET', '/api/v1/analytics/revenue', None),
+    ('analytics_occupancy', 'GET', '/api/v1/analytics/occupancy?year=2024', None),
+    ('rooms_ndjson', 'GET', '/api/v1/rooms?format=ndjson', None),
+    ('allocate_and_release_room', _allocate_and_release),
+    ('allocate_rooms_bulk_and_release', _allocate_bulk_and_release),
+    ('reserve_room_nights', _reserve_room_nights),
+    ('reserve_and_free_room_nights', _reserve_and_free_room_nights),
+    ('update_room_type_price', 'PATCH', '/api/v1/room_types/5/price', {"base_price": 1500.0}),
+    ('update_room_type_prices_bulk', 'PATCH', '/api/v1/room_types/prices',
+     {"prices": [{"room_type_id": room_type_id, "base_price": 1000.0 + room_type_id} for room_type_id in range(1, 9)]}),
+    ('update_price_idempotency_key', _update_price_new_key),
+    ('update_price_idempotent_replay', _update_price_replay),
+]
+
+# Sends requests for one scenario from concurrency threads and returns latency statistics
+# (request(n) sends the n-th request and returns its status)
+def _measure(request, requests_count, concurrency):
+    numbers = itertools.count(1)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    per_thread = max(requests_count // concurrency, 1)
+
+    def worker():
+        local_latencies = []
+        local_statuses = {}
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            status = request(next(numbers))
+            local_latencies.append((time.perf_counter() - started) * 1000)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    percentile = lambda fraction: latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+# Returns a send(method, path, body, headers=None) -> (status, JSON body or None) function
+# using Flask's test client or a running server
+def _sender(base_url, response_cache_enabled):
+    if base_url:
+        import requests
+        local = threading.local()
+
+        def send(method, path, body, headers=None):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            response = local.session.request(method, base_url + path, json=body, headers=headers)
+            is_json = response.headers.get('Content-Type', '').startswith('application/json')
+            return response.status_code, response.json() if is_json else None
+        return send
+
+    from api.response_cache import response_cache
+    from app import create_app
+    app = create_app()
+
+    # A cache that may not hold any entry turns every request into a miss
+    if not response_cache_enabled:
+        response_cache.max_entries = 0
+    local = threading.local()
+
+    def send(method, path, body, headers=None):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        response = local.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+    return send
+
+# Prints the relative change of every scenario compared to a previous result file
+def _compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)["scenarios"]
+
+    print(f"\n{'scenario':<32}{'p50 before':>12}{'p50 after':>12}{'p99 before':>12}{'p99 after':>12}{'req/s change':>14}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        change = (result["requests_per_second"] / before["requests_per_second"] - 1) * 100
+        print(f"{name:<32}{before['p50_ms']:>12.3f}{result['p50_ms']:>12.3f}"
+              f"{before['p99_ms']:>12.3f}{result['p99_ms']:>12.3f}{change:>+13.1f}%")
+
+# Seeds a synthetic inventory and booking history, drives every scenario and writes the results as JSON
+def run(rooms, bookings, requests_count, concurrency, base_url, output, baseline, response_cache_enabled=True):
+    database_path = None if base_url else use_temporary_database()
+    try:
+        if database_path:
+            seed_synthetic_rooms(rooms)
+            seed_synthetic_bookings(bookings)
+
+        # The worst-case stay is the longest one accepted, crossing every season of a year
+        first_day = '2024-01-01'
+        last_day = (date.fromisoformat(first_day) + timedelta(days=MAX_STAY_DAYS)).isoformat()
+        send = _sender(base_url, response_cache_enabled)
+
+        # The change log page is read from the recent part of the log, which pruning keeps
+        first_change = max(send('GET', '/api/v1/changes', None)[1]["last_seq"] - 500, 0)
+
+        results = {}
+        for name, *scenario in SCENARIOS:
+            if len(scenario) == 1:
+                request = lambda n, function=scenario[0]: function(send, n)
+            else:
+                method, path, body = scenario
+                path = path.format(first_day=first_day, last_day=last_day, first_change=first_change)
+                request = lambda n, method=method, path=path, body=body: send(method, path, body)[0]
+            request(0)  # warm-up
+            results[name] = _measure(request, requests_count, concurrency)
+            print(f"{name:<32} p50={results[name]['p50_ms']:>8.3f}ms p95={results[name]['p95_ms']:>8.3f}ms "
+                  f"p99={results[name]['p99_ms']:>8.3f}ms {results[name]['requests_per_second']:>9,.0f} req/s "
+                  f"statuses={results[name]['statuses']}")
+
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "target": base_url or "flask-test-client",
+            "rooms": rooms if database_path else None,
+            "bookings": bookings if database_path else None,
+            "requests_per_scenario": requests_count,
+            "concurrency": concurrency,
+            "response_cache": response_cache_enabled,
+            "scenarios": results
+        }
+        with open(output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"\nResults written to {output}")
+
+        if baseline:
+            _compare(results, baseline)
+    finally:
+        if database_path:
+            remove_temporary_database(database_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark every endpoint against a synthetic inventory')
+    parser.add_argument('--rooms', type=int, default=214, help='total rooms in the synthetic inventory')
+    parser.add_argument('--bookings', type=int, default=100000, help='bookings in the synthetic booking history')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent client threads')
+    parser.add_argument('--base-url', help='benchmark a running server (e.g. http://127.0.0.1:5002) instead of the test client')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file for the results')
+    parser.add_argument('--compare', help='previous results JSON file to compare against')
+    parser.add_argument('--no-response-cache', action='store_true', help='measure catalog endpoints without the response cache')
+    args = parser.parse_args()
+    run(args.rooms, args.bookings, args.requests, args.concurrency, args.base_url, args.output, args.compare,
+        not args.no_response_cache)
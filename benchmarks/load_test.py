@@ -0,0 +1,71 @@
+import argparse
+import threading
+import time
+import requests
+from benchmarks.common import remove_temporary_database, start_server, use_temporary_database
+
+# Endpoints hit in rotation by every client thread
+ENDPOINTS = [
+    '/api/v1/calculate_price/3?start_date=2024-06-01&end_date=2024-06-30',
+    '/api/v1/room_types/availability',
+    '/api/v1/rooms/42',
+    '/api/v1/room_types',
+]
+
+# Runs client threads against a server for a fixed duration, returns requests/sec and latency percentiles
+def _drive(port, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        local = []
+        index = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = session.get(f'http://127.0.0.1:{port}{ENDPOINTS[index % len(ENDPOINTS)]}')
+            local.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                with lock:
+                    errors[0] += 1
+            index += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    percentile = lambda fraction: latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+    return len(latencies) / duration, percentile(0.5), percentile(0.99), errors[0]
+
+# Measures throughput of the production server for each worker count
+def run(worker_counts, threads, clients, duration, port):
+    database_path = use_temporary_database()
+    try:
+        for workers in worker_counts:
+            server = start_server(database_path, workers, threads, port)
+            try:
+                requests_per_second, p50, p99, errors = _drive(port, clients, duration)
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"workers={workers} threads={threads} clients={clients}: {requests_per_second:,.0f} req/s "
+                  f"p50={p50:.1f}ms p99={p99:.1f}ms errors={errors}")
+    finally:
+        remove_temporary_database(database_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the gunicorn server with increasing worker counts')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+    run(args.workers, args.threads, args.clients, args.duration, args.port)
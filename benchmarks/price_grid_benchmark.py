@@ -0,0 +1,62 @@
+import argparse
+import time
+from datetime import date, timedelta
+from benchmarks.common import remove_temporary_database, use_temporary_database
+
+# Publishes the rates of every room type for days nights with one price request per room type and night,
+# then with one grid request (uncached, cached and right after a price update)
+def run(days, start):
+    path = use_temporary_database()
+    try:
+        from api.response_cache import response_cache
+        from app import create_app
+        from repositories.calculate_price_repository import rate_grid
+        client = create_app().test_client()
+        room_type_ids = [room_type['id'] for room_type in client.get('/api/v1/room_types').get_json()]
+        first_day = date.fromisoformat(start)
+
+        started = time.perf_counter()
+        per_night = {}
+        for room_type_id in room_type_ids:
+            for offset in range(days):
+                night = (first_day + timedelta(days=offset)).isoformat()
+                response = client.get(f'/api/v1/calculate_price/{room_type_id}?start_date={night}&end_date={night}')
+                per_night[room_type_id, offset] = response.get_json()["price"]
+        per_night_seconds = time.perf_counter() - started
+        print(f"room_types={len(room_type_ids)} days={days}")
+        print(f"{'one request per room type and night':<38} {per_night_seconds * 1000:>9.1f}ms "
+              f"({len(per_night)} requests)")
+
+        url = f'/api/v1/calculate_price/grid?start={start}&days={days}'
+        for name, query in (('grid', ''), ('grid compact', '&compact=true')):
+            response_cache.clear()
+            started = time.perf_counter()
+            response = client.get(url + query)
+            uncached = time.perf_counter() - started
+            started = time.perf_counter()
+            client.get(url + query)
+            cached = time.perf_counter() - started
+            print(f"{name + ' (uncached / cached)':<38} {uncached * 1000:>9.1f}ms {cached * 1000:>7.2f}ms "
+                  f"({len(response.get_data()):,} bytes)")
+
+        # The grid must agree with the per-night prices
+        grid = response.get_json()["room_types"]
+        mismatches = sum(per_night[room_type["id"], offset] != price
+                         for room_type in grid for offset, price in enumerate(room_type["rates"]))
+        print(f"{'mismatches against per-night prices':<38} {mismatches}")
+
+        # A price update rebuilds one row of the grid before the next request
+        client.patch(f'/api/v1/room_types/{room_type_ids[0]}/price', json={"base_price": 999.0})
+        started = time.perf_counter()
+        client.get(url + '&compact=true')
+        print(f"{'grid compact after a price update':<38} {(time.perf_counter() - started) * 1000:>9.1f}ms")
+        print(f"grid stats: {rate_grid.stats()}")
+    finally:
+        remove_temporary_database(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark per-night price requests against the price grid')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--start', default='2024-11-01')
+    args = parser.parse_args()
+    run(args.days, args.start)
@@ -0,0 +1,90 @@
+import argparse
+import random
+import statistics
+import threading
+import time
+from benchmarks.common import remove_temporary_database, seed_synthetic_rooms, use_temporary_database
+
+# Runs readers (catalog lists) and one writer (availability updates) for duration seconds
+# Returns (writer latencies in ms, completed reads)
+def _contend(rooms, readers, duration):
+    from repositories.room_repository import db_get_rooms_json, db_update_room_availability
+    from repositories.room_type_repository import db_get_room_types_with_availability
+
+    stop = threading.Event()
+    reads = [0] * readers
+    latencies = []
+
+    def reader(index):
+        generator = random.Random(index)
+        while not stop.is_set():
+            db_get_rooms_json(room_type_id=generator.randint(1, 8), limit=1000)
+            db_get_room_types_with_availability()
+            reads[index] += 1
+
+    def writer():
+        generator = random.Random(99)
+        while not stop.is_set():
+            started = time.perf_counter()
+            db_update_room_availability(generator.randint(1, rooms), generator.randint(0, 1))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=reader, args=(index,)) for index in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(reads)
+
+# Compares writer latency and read throughput with reads on the primary database and on the read snapshot
+def run(rooms, readers, duration, snapshot_seconds):
+    path = use_temporary_database()
+    try:
+        seed_synthetic_rooms(rooms)
+        import database.snapshot as snapshot
+
+        print(f"rooms={rooms} readers={readers} duration={duration}s")
+        for name, seconds in (('primary', 0), (f'snapshot every {snapshot_seconds}s', snapshot_seconds)):
+            snapshot.READ_SNAPSHOT_SECONDS = seconds
+            latencies, reads = _contend(rooms, readers, duration)
+            quantiles = statistics.quantiles(latencies, n=100)
+            print(f"{name:<20} writes={len(latencies):>7} p50={quantiles[49]:>6.2f}ms p99={quantiles[98]:>7.2f}ms "
+                  f"reads/s={reads / duration:>8.1f}")
+        print(f"snapshot stats: {snapshot.snapshot_stats()}")
+    finally:
+        remove_temporary_database(path)
+
+# Checks that a reservation shows up at once in the (cached) ranged availability in snapshot mode,
+# since room nights are read from the primary database; exits with an error if it does not
+def check_room_nights_fresh(snapshot_seconds):
+    path = use_temporary_database()
+    try:
+        import database.snapshot as snapshot
+        from app import create_app
+        snapshot.READ_SNAPSHOT_SECONDS = snapshot_seconds
+        client = create_app().test_client()
+
+        url = '/api/v1/room_types/availability?start_date=2024-07-01&end_date=2024-07-03'
+        room = client.get('/api/v1/rooms?limit=1').get_json()[0]
+        before = {row["id"]: row["available_count"] for row in client.get(url).get_json()}
+        client.post(f'/api/v1/rooms/{room["id"]}/nights', json={"start_date": "2024-07-02", "end_date": "2024-07-04"})
+        after = {row["id"]: row["available_count"] for row in client.get(url).get_json()}
+        fresh = after[room["room_type_id"]] == before[room["room_type_id"]] - 1
+        print(f"ranged availability right after a reservation: {'fresh' if fresh else 'STALE'}")
+    finally:
+        remove_temporary_database(path)
+    if not fresh:
+        raise SystemExit('Ranged availability is served stale in snapshot mode')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark writer latency under read load with and without the read snapshot')
+    parser.add_argument('--rooms', type=int, default=100000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--snapshot-seconds', type=float, default=2)
+    args = parser.parse_args()
+    run(args.rooms, args.readers, args.duration, args.snapshot_seconds)
+    check_room_nights_fresh(args.snapshot_seconds)
@@ -0,0 +1,131 @@
+import argparse
+import sqlite3
+import threading
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+import requests
+from benchmarks.common import remove_temporary_database, seed_synthetic_rooms, start_server, use_temporary_database
+
+# Sends the same request from clients threads at once, returns the responses
+def _burst(app, clients, send):
+    responses = [None] * clients
+    barrier = threading.Barrier(clients)
+
+    def client(index):
+        test_client = app.test_client()
+        barrier.wait()
+        responses[index] = send(test_client)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+# Replays allocations (retry storms) with and without Idempotency-Key, and bursts of identical GETs after writes
+def run(rooms, clients, rounds):
+    path = use_temporary_database()
+    try:
+        seed_synthetic_rooms(rooms)
+        from api.idempotency import idempotency_store
+        from api.response_cache import request_coalescer
+        from app import create_app
+        from database.instrumentation import get_totals
+        app = create_app()
+
+        print(f"rooms={rooms} clients={clients} rounds={rounds}")
+        for name, with_key in (('retries without Idempotency-Key', False), ('retries with Idempotency-Key', True)):
+            allocated = set()
+            for _ in range(rounds):
+                headers = {'Idempotency-Key': str(uuid.uuid4())} if with_key else {}
+                for response in _burst(app, clients, lambda client: client.post('/api/v1/rooms/4/allocate', headers=headers)):
+                    if response.status_code == 200:
+                        allocated.add(response.get_json()["room_id"])
+            print(f"{name:<34} {rounds} bookings sent {clients}x each -> {len(allocated)} rooms allocated")
+        print(f"idempotency stats: {idempotency_store.stats()}")
+
+        urls = [('price quote', '/api/v1/calculate_price/8?start_date=2024-06-01&end_date=2024-08-31'),
+                ('room types availability after a write', '/api/v1/room_types/availability')]
+        for name, url in urls:
+            statements = 0
+            elapsed = 0.0
+            for round_index in range(rounds):
+                app.test_client().patch('/api/v1/rooms/1/availability', json={"availability": round_index % 2})
+                before = get_totals()["statements"]
+                started = time.perf_counter()
+                _burst(app, clients, lambda client: client.get(url))
+                elapsed += time.perf_counter() - started
+                statements += get_totals()["statements"] - before
+            print(f"{name:<38} {statements / (rounds * clients):>6.2f} SQL statements per GET "
+                  f"({elapsed * 1000 / rounds:.1f}ms per burst)")
+        print(f"coalescing stats: {request_coalescer.stats()}")
+    finally:
+        remove_temporary_database(path)
+
+# Returns the newest Last-Modified of GET /room_types over requests spread across the workers (a new connection
+# each, so they are not pinned to one worker); a worker that invalidated its caches reports the time of invalidation
+def _room_types_last_modified(port, requests_sent=40):
+    return max(parsedate_to_datetime(requests.get(f'http://127.0.0.1:{port}/api/v1/room_types').headers['Last-Modified'])
+               for _ in range(requests_sent))
+
+# Checks idempotency keys with several gunicorn workers: retries of one key on all workers allocate a single room,
+# and keyed requests write nothing to the primary database, so no worker invalidates its caches
+def check_workers(workers, clients, port=5097):
+    path = use_temporary_database()
+    primary = sqlite3.connect(path)
+    try:
+        server = start_server(path, workers, 4, port)
+        try:
+            base = f'http://127.0.0.1:{port}/api/v1'
+            barrier = threading.Barrier(clients)
+            responses = []
+
+            def client():
+                session = requests.Session()
+                barrier.wait()
+                responses.append(session.post(f'{base}/rooms/4/allocate', headers={'Idempotency-Key': 'storm'}))
+
+            threads = [threading.Thread(target=client) for _ in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            allocated = {response.json()["room_id"] for response in responses if response.status_code == 200}
+            replayed = sum(response.headers.get('Idempotent-Replayed') == 'true' for response in responses)
+            print(f"workers={workers}: {clients} retries of one key -> {len(allocated)} rooms allocated, {replayed} replayed")
+
+            # PRAGMA data_version of another connection changes with every commit, which is what the workers watch
+            last_modified = _room_types_last_modified(port)
+            data_version = primary.execute('PRAGMA data_version').fetchone()[0]
+            # Last-Modified has one second resolution
+            time.sleep(1.1)
+            for index in range(clients):
+                requests.patch(f'{base}/room_types/999999/price', json={"base_price": 100.0},
+                               headers={'Idempotency-Key': f'missing-{index}'})
+            unchanged = (primary.execute('PRAGMA data_version').fetchone()[0] == data_version
+                         and _room_types_last_modified(port) <= last_modified)
+            print(f"workers={workers}: {clients} keyed requests -> data versions "
+                  f"{'unchanged' if unchanged else 'CHANGED'}")
+        finally:
+            server.terminate()
+            server.wait()
+    finally:
+        primary.close()
+        remove_temporary_database(path)
+
+    if len(allocated) != 1 or not unchanged:
+        raise SystemExit('Idempotency keys are not shared or invalidate caches across workers')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark idempotent retries and coalesced identical GETs')
+    parser.add_argument('--rooms', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=0,
+                        help='also check keys shared by this many gunicorn workers (fails if a check does not hold)')
+    args = parser.parse_args()
+    run(args.rooms, args.clients, args.rounds)
+    if args.workers:
+        check_workers(args.workers, args.clients)
@@ -0,0 +1,46 @@
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from benchmarks.common import (
+    remove_temporary_database,
+    seed_synthetic_room_nights,
+    seed_synthetic_rooms,
+    use_temporary_database,
+)
+from repositories.room_night_repository import db_get_room_types_availability_for_range
+
+# Measures latency of the date-ranged availability query on a large occupancy store
+def run(rooms, nights, occupancy, queries):
+    path = use_temporary_database()
+    try:
+        first_night = date(2025, 1, 1)
+        started = time.perf_counter()
+        seed_synthetic_rooms(rooms)
+        booked = seed_synthetic_room_nights(nights, occupancy, first_night)
+        print(f"seeded rooms={rooms} nights={nights} booked_room_nights={booked} "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        generator = random.Random(7)
+        for stay_length in (1, 7, 30):
+            timings = []
+            for _ in range(queries):
+                start = first_night + timedelta(days=generator.randint(0, nights - stay_length))
+                query_started = time.perf_counter()
+                db_get_room_types_availability_for_range(start, start + timedelta(days=stay_length))
+                timings.append((time.perf_counter() - query_started) * 1000)
+            timings.sort()
+            print(f"stay_length={stay_length:>2} nights: p50={statistics.median(timings):.2f}ms "
+                  f"p95={timings[int(len(timings) * 0.95) - 1]:.2f}ms max={timings[-1]:.2f}ms")
+    finally:
+        remove_temporary_database(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark date-ranged room type availability')
+    parser.add_argument('--rooms', type=int, default=5000)
+    parser.add_argument('--nights', type=int, default=365)
+    parser.add_argument('--occupancy', type=float, default=0.7)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+    run(args.rooms, args.nights, args.occupancy, args.queries)
@@ -0,0 +1,68 @@
+import argparse
+import statistics
+import time
+import tracemalloc
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from api.json_provider import FastJSONProvider, orjson
+from benchmarks.common import remove_temporary_database, seed_synthetic_rooms, use_temporary_database
+from repositories.room_repository import db_get_rooms, db_get_rooms_json
+from repositories.room_type_repository import (
+    db_get_room_types_with_availability,
+    db_get_room_types_with_availability_json,
+)
+
+# Returns the median seconds of runs calls and the peak traced memory of one more call
+def _measure(build, runs):
+    build()  # warm-up
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        build()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    body = build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(timings), peak, len(body)
+
+# Compares fetching and encoding the room list and room type availability with each serialization strategy
+def run(rooms, runs):
+    path = use_temporary_database()
+    try:
+        seed_synthetic_rooms(rooms)
+        app = Flask(__name__)
+        stdlib = DefaultJSONProvider(app)
+        fast = FastJSONProvider(app, 'orjson')
+
+        strategies = [
+            ('rows as dicts + stdlib json', lambda fetch, _: stdlib.response(fetch()).get_data()),
+            ('rows as dicts + orjson', lambda fetch, _: fast.response(fetch()).get_data()),
+            ('SQLite json_group_array', lambda _, fetch_json: fetch_json()[0].encode()),
+        ]
+        if orjson is None:
+            strategies.pop(1)
+
+        endpoints = [
+            ('/rooms', db_get_rooms, db_get_rooms_json, rooms),
+            ('/room_types/availability', db_get_room_types_with_availability,
+             db_get_room_types_with_availability_json, None),
+        ]
+        with app.app_context():
+            for endpoint, fetch, fetch_json, count in endpoints:
+                count = count or len(fetch())
+                print(f"\n{endpoint} ({count} rows)")
+                for name, build in strategies:
+                    seconds, peak, size = _measure(lambda: build(fetch, fetch_json), runs)
+                    print(f"{name:<30} {seconds * 1000:>9.2f}ms {seconds / count * 1e6:>7.2f}us/row "
+                          f"peak={peak / 1024:>9.0f}KiB {peak / count:>6.0f}B/row body={size / 1024:.0f}KiB")
+    finally:
+        remove_temporary_database(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark JSON serialization of large list responses')
+    parser.add_argument('--rooms', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    run(args.rooms, args.runs)
@@ -0,0 +1,50 @@
+import argparse
+from database.connection import get_connection
+
+# Returns room types whose stored available_count differs from the actual number of available rooms
+def check_availability_counters():
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT RoomTypes.id AS room_type_id,
+                   RoomTypeAvailability.available_count AS stored_count,
+                   (SELECT COUNT(*) FROM Rooms
+                    WHERE Rooms.room_type_id = RoomTypes.id AND Rooms.availability = 1) AS actual_count
+            FROM RoomTypes
+            LEFT JOIN RoomTypeAvailability ON RoomTypeAvailability.room_type_id = RoomTypes.id
+            WHERE stored_count IS NULL OR stored_count != actual_count
+        """)
+        return [dict(row) for row in cursor.fetchall()]
+
+# Recomputes all availability counters from the Rooms table in one transaction
+def rebuild_availability_counters():
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('DELETE FROM RoomTypeAvailability')
+        cursor.execute("""
+            INSERT INTO RoomTypeAvailability (room_type_id, available_count)
+            SELECT RoomTypes.id, COUNT(Rooms.id)
+            FROM RoomTypes
+            LEFT JOIN Rooms ON RoomTypes.id = Rooms.room_type_id AND Rooms.availability = 1
+            GROUP BY RoomTypes.id
+        """)
+        connection.commit()
+
+# Command line entry point: python -m database.availability_counters check|rebuild
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check or rebuild room type availability counters')
+    parser.add_argument('command', choices=['check', 'rebuild'])
+    args = parser.parse_args()
+
+    mismatches = check_availability_counters()
+    for mismatch in mismatches:
+        print(f"Room type {mismatch['room_type_id']}: stored {mismatch['stored_count']}, actual {mismatch['actual_count']}")
+
+    if args.command == 'rebuild':
+        rebuild_availability_counters()
+        print("Availability counters rebuilt.")
+    elif not mismatches:
+        print("Availability counters are consistent.")
+    else:
+        raise SystemExit(1)
@@ -0,0 +1,43 @@
+import logging
+import os
+import threading
+import time
+from database.data_versions import get_change_generation
+from repositories.change_repository import db_prune_changes
+
+# Number of newest change log entries kept (can be overridden with CHANGE_LOG_KEEP)
+CHANGE_LOG_KEEP = int(os.environ.get('CHANGE_LOG_KEEP', 100000))
+
+# Seconds between prunes of the change log by a running process
+# (can be overridden with CHANGE_LOG_PRUNE_SECONDS, 0 prunes only when the database is initialized)
+CHANGE_LOG_PRUNE_SECONDS = float(os.environ.get('CHANGE_LOG_PRUNE_SECONDS', 60))
+
+logger = logging.getLogger('room_inventory.change_log')
+
+_pruner_pid = None
+_lock = threading.Lock()
+
+# Prunes the change log every CHANGE_LOG_PRUNE_SECONDS, skipped while nothing was written
+def _prune_periodically():
+    pruned_generation = None
+    while True:
+        time.sleep(CHANGE_LOG_PRUNE_SECONDS)
+        generation = get_change_generation()
+        if generation == pruned_generation:
+            continue
+        try:
+            db_prune_changes(CHANGE_LOG_KEEP)
+            pruned_generation = generation
+        except Exception:
+            logger.exception("Pruning the change log failed")
+
+# Starts the change log pruner of this process, once per process (a forked worker starts its own)
+def start_change_log_pruner():
+    global _pruner_pid
+    if not CHANGE_LOG_PRUNE_SECONDS:
+        return
+    with _lock:
+        if _pruner_pid == os.getpid():
+            return
+        _pruner_pid = os.getpid()
+    threading.Thread(target=_prune_periodically, name='change-log-pruner', daemon=True).start()
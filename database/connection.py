@@ -1,7 +1,175 @@
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
+from database.instrumentation import InstrumentedConnection, record_connection_acquired, record_connection_created
 
-# Creates database connection with row factory
-def create_connection():
-    connection = sqlite3.connect('database/room_inventory.db')
+# Path to the SQLite database file (can be overridden with ROOM_INVENTORY_DB)
+DATABASE_PATH = os.environ.get('ROOM_INVENTORY_DB', 'database/room_inventory.db')
+
+# Pool and connection tuning (can be overridden with environment variables)
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5.0))
+BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', 5.0))
+CACHED_STATEMENTS = 256
+MMAP_SIZE = 64 * 1024 * 1024
+CACHE_SIZE_KB = 16 * 1024
+
+# Creates database connection with row factory and performance pragmas
+# (read_only_path opens that file read-only and immutable, i.e. without any locking, for snapshots nobody writes to)
+def create_connection(read_only_path=None):
+    connection = sqlite3.connect(
+        f'file:{read_only_path}?mode=ro&immutable=1' if read_only_path else DATABASE_PATH,
+        timeout=BUSY_TIMEOUT,
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=False,
+        factory=InstrumentedConnection,
+        uri=read_only_path is not None
+    )
     connection.row_factory = sqlite3.Row
-    return connection
\ No newline at end of file
+    record_connection_created()
+
+    # WAL lets readers run concurrently with a writer, NORMAL sync is safe in WAL mode
+    if not read_only_path:
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    connection.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    connection.execute('PRAGMA temp_store=MEMORY')
+    return connection
+
+# Thread-safe pool of configured connections, reused across requests
+class ConnectionPool:
+    def __init__(self, size, timeout, connect=create_connection):
+        self.size = size
+        self.timeout = timeout
+        self._connect = connect
+        self._pid = os.getpid()
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._generation = 0
+        self._condition = threading.Condition()
+        self._stats = {"hits": 0, "misses": 0, "waits": 0, "timeouts": 0}
+
+    # Forgets connections inherited through fork(), a SQLite connection must not be used by two processes
+    def _reset_after_fork(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._open = 0
+
+    # Takes an idle connection, opens a new one if below size, otherwise waits for a release
+    def acquire(self):
+        with self._condition:
+            self._reset_after_fork()
+            if not self._idle and self._open >= self.size:
+                self._stats["waits"] += 1
+                if not self._condition.wait_for(lambda: self._idle or self._open < self.size, self.timeout):
+                    self._stats["timeouts"] += 1
+                    raise TimeoutError("Timed out waiting for a database connection")
+
+            if self._idle:
+                self._stats["hits"] += 1
+                return self._idle.pop()
+
+            self._stats["misses"] += 1
+            self._open += 1
+            generation = self._generation
+
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+
+        # Tagged with the pool generation, so a connection opened before close() is not reused afterwards
+        connection.pool_generation = generation
+        return connection
+
+    # Returns a connection to the pool, rolling back anything left uncommitted
+    # Connections opened before the last close() (e.g. to a database file that was replaced) are closed instead
+    def release(self, connection):
+        if self._pid != os.getpid():
+            return
+        if self._closed or connection.pool_generation != self._generation:
+            self.discard(connection)
+            return
+
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            self.discard(connection)
+            return
+
+        with self._condition:
+            # Checked again under the lock, the pool may have been closed during the rollback
+            if not self._closed and connection.pool_generation == self._generation:
+                self._idle.append(connection)
+                self._condition.notify()
+                return
+        self.discard(connection)
+
+    # Closes a broken connection and frees its slot
+    def discard(self, connection):
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    # Closes all idle connections (retire=True also closes the ones in use as soon as they are released)
+    def close(self, retire=False):
+        with self._condition:
+            self._closed = retire
+            self._generation += 1
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for connection in idle:
+            connection.close()
+
+    # Returns pool metrics (hits, misses, waits, timeouts, open and in-use connections)
+    def stats(self):
+        with self._condition:
+            return {
+                **self._stats,
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle)
+            }
+
+_pool = ConnectionPool(POOL_SIZE, POOL_TIMEOUT)
+
+# Borrows a pooled connection for the duration of a with-block
+@contextmanager
+def get_connection():
+    connection = _pool.acquire()
+    record_connection_acquired()
+    try:
+        yield connection
+    except Exception:
+        if connection.in_transaction:
+            connection.rollback()
+        raise
+    finally:
+        _pool.release(connection)
+
+# Returns connection pool metrics
+def pool_stats():
+    return _pool.stats()
+
+# Closes all pooled connections (e.g. before the database file is replaced)
+def close_pool():
+    _pool.close()
+
+# Points the service at another database file and drops connections to the old one
+def set_database_path(path):
+    global DATABASE_PATH
+    close_pool()
+    DATABASE_PATH = path
@@ -17,15 +17,16 @@ SEASONS = {
     'HIGH': 1.2    # High season multiplier (20% increase)
 }
 
-# Season dates with corresponding season IDs
-SEASON_DATES = [
-    (1, '2024-01-06', '2024-03-31'),  # LOW season (Winter)
-    (2, '2024-04-01', '2024-06-14'),  # MID season (Spring)
-    (3, '2024-06-15', '2024-08-31'),  # HIGH season (Summer)
-    (2, '2024-09-01', '2024-10-31'),  # MID season (Early Fall)
-    (2, '2024-12-01', '2024-12-14'),  # MID season (Pre-Christmas)
-    (3, '2024-12-15', '2025-01-05'),  # HIGH season (Christmas/New Year)
-    (1, '2024-11-01', '2024-11-30')   # LOW season (Late Fall)
+# Recurring season rules (season ID, first day MM-DD, last day MM-DD), repeated every year
+# A rule whose last day is before its first day continues into the next year
+SEASON_RULES = [
+    (1, '01-06', '03-31'),  # LOW season (Winter)
+    (2, '04-01', '06-14'),  # MID season (Spring)
+    (3, '06-15', '08-31'),  # HIGH season (Summer)
+    (2, '09-01', '10-31'),  # MID season (Early Fall)
+    (1, '11-01', '11-30'),  # LOW season (Late Fall)
+    (2, '12-01', '12-14'),  # MID season (Pre-Christmas)
+    (3, '12-15', '01-05')   # HIGH season (Christmas/New Year)
 ]
 
 # Room counts for each type (214 in total)
@@ -0,0 +1,85 @@
+import threading
+import time
+
+# Data sets whose changes invalidate cached reads
+ROOMS = 'rooms'
+ROOM_TYPES = 'room_types'
+ROOM_NIGHTS = 'room_nights'
+SEASONS = 'seasons'
+BOOKINGS = 'bookings'
+ALL_DATA_SETS = (ROOMS, ROOM_TYPES, ROOM_NIGHTS, SEASONS, BOOKINGS)
+
+_started_at = time.time()
+_versions = {}
+_modified_at = {}
+_lock = threading.Lock()
+
+# Notified on every change, lets long-polling readers sleep until something was written
+_changed = threading.Condition(_lock)
+_generation = 0
+
+# Connection used to notice commits made by other processes (None when running as a single process)
+_watcher = None
+_watched_version = None
+
+def _bump(data_sets):
+    global _generation
+    _generation += 1
+    _changed.notify_all()
+    now = time.time()
+    for data_set in data_sets:
+        _versions[data_set] = _versions.get(data_set, 0) + 1
+        _modified_at[data_set] = now
+
+# PRAGMA data_version changes whenever another connection commits; the changed tables are unknown, so bump all
+def _check_external_changes():
+    global _watched_version
+    if _watcher is None:
+        return
+    version = _watcher.execute('PRAGMA data_version').fetchone()[0]
+    if version != _watched_version:
+        _watched_version = version
+        _bump(ALL_DATA_SETS)
+
+# Invalidates all data sets whenever any other connection or process commits (needed with several workers)
+def watch_external_changes(connection):
+    global _watcher, _watched_version
+    with _lock:
+        _watcher = connection
+        _watched_version = connection.execute('PRAGMA data_version').fetchone()[0]
+
+# Marks data sets as changed, must be called by every write path after it commits
+def bump_data_version(*data_sets):
+    with _lock:
+        _bump(data_sets)
+
+# Returns the current versions of data sets as a tuple (usable as part of a cache key)
+def get_data_versions(data_sets):
+    with _lock:
+        _check_external_changes()
+        return tuple(_versions.get(data_set, 0) for data_set in data_sets)
+
+# Returns the time (epoch seconds) of the latest change to any of the data sets
+def get_last_modified(data_sets):
+    with _lock:
+        return max((_modified_at.get(data_set, _started_at) for data_set in data_sets), default=_started_at)
+
+# Returns a counter that increases with every change (pass it to wait_for_change)
+def get_change_generation():
+    with _lock:
+        _check_external_changes()
+        return _generation
+
+# Waits until a change newer than generation happened or timeout seconds passed, returns True on change
+# Commits of other processes are only noticed by polling, so the wait is cut into poll_interval steps
+def wait_for_change(generation, timeout, poll_interval=0.5):
+    deadline = time.monotonic() + timeout
+    with _lock:
+        while True:
+            _check_external_changes()
+            if _generation != generation:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            _changed.wait(min(remaining, poll_interval))
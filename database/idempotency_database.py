@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from database import connection as primary
+from database.connection import BUSY_TIMEOUT, POOL_SIZE, POOL_TIMEOUT, ConnectionPool
+from database.instrumentation import InstrumentedConnection, record_connection_acquired, record_connection_created
+
+# Path of the idempotency key database (can be overridden with IDEMPOTENCY_DB, defaults to a file next to the
+# primary database). Keys are written on every keyed request, in the primary database each of those commits would
+# count as an external write in the other workers and invalidate all their caches (see database/data_versions.py)
+IDEMPOTENCY_DB = os.environ.get('IDEMPOTENCY_DB')
+
+_pool = None
+_pool_path = None
+_lock = threading.Lock()
+
+# Returns the path of the idempotency key database
+def idempotency_database_path():
+    if IDEMPOTENCY_DB:
+        return IDEMPOTENCY_DB
+    root, extension = os.path.splitext(primary.DATABASE_PATH)
+    return f"{root}-idempotency{extension or '.db'}"
+
+# Opens a connection to the idempotency key database, creating the table on first use
+def _create_connection(path):
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False, factory=InstrumentedConnection)
+    connection.row_factory = sqlite3.Row
+    record_connection_created()
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+
+    # Create IdempotencyKeys table (shared by all workers, status is NULL while the first request is running)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS IdempotencyKeys (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            status INTEGER,
+            headers TEXT,
+            body BLOB,
+            started_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+
+    # Create index on the expiry so expired keys are pruned without a table scan
+    connection.execute('CREATE INDEX IF NOT EXISTS idempotency_keys_idx_expires_at ON IdempotencyKeys(expires_at)')
+    return connection
+
+# Returns the pool of the current idempotency key database, replacing it when the primary database moved
+def _current_pool():
+    global _pool, _pool_path
+    path = idempotency_database_path()
+    with _lock:
+        if _pool_path != path:
+            if _pool is not None:
+                _pool.close(retire=True)
+            _pool = ConnectionPool(POOL_SIZE, POOL_TIMEOUT, connect=lambda: _create_connection(path))
+            _pool_path = path
+        return _pool
+
+# Borrows a connection to the idempotency key database for the duration of a with-block
+@contextmanager
+def get_idempotency_connection():
+    pool = _current_pool()
+    connection = pool.acquire()
+    record_connection_acquired()
+    try:
+        yield connection
+    except Exception:
+        if connection.in_transaction:
+            connection.rollback()
+        raise
+    finally:
+        pool.release(connection)
+
+# Closes pooled connections to the idempotency key database
+def close_idempotency_pool():
+    global _pool, _pool_path
+    with _lock:
+        if _pool is not None:
+            _pool.close(retire=True)
+        _pool = None
+        _pool_path = None
@@ -1,18 +1,44 @@
-import pandas as pd
 import os
+from database.availability_counters import check_availability_counters, rebuild_availability_counters
+from database.change_log import CHANGE_LOG_KEEP
 from database.connection import create_connection
-from database.constants import BASE_PRICES, SEASONS, SEASON_DATES, ROOM_COUNTS
+from database.data_versions import ALL_DATA_SETS, BOOKINGS, ROOMS, bump_data_version
+from database.constants import BASE_PRICES, SEASONS, SEASON_RULES, ROOM_COUNTS
+from repositories.change_repository import db_prune_changes
+from repositories.room_type_repository import invalidate_room_type_ids
+from repositories.season_calendar import get_season_calendar, invalidate_season_calendar
 
-# Initializes database with tables and data
-def init_db():
+# Inventory CSV loaded into a new database
+DEFAULT_CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                'csv/international_names_with_rooms_1000.csv')
+
+# Initializes database with tables and data (csv_path=None seeds base data without rooms)
+def init_db(csv_path=DEFAULT_CSV_PATH):
     _create_tables()
 
     # If data does not exist in database, insert base data and read CSV data
     if not _check_data_exists():
-        _insert_season_multiplier_data()
-        _insert_room_type_data()
-        _insert_season_dates()
-        _read_csv_data()
+        _insert_base_data()
+        if csv_path:
+            import_rooms_csv(csv_path)
+
+    # Seed the recurring season rules (also for databases created before the rules existed)
+    _insert_missing_season_rules()
+
+    # Rebuild availability counters if they drifted or predate the counter triggers
+    if check_availability_counters():
+        rebuild_availability_counters()
+
+    # Bound the change log, consumers behind the pruned entries get 410 and reload the full state
+    db_prune_changes(CHANGE_LOG_KEEP)
+
+    # Season data may have been (re)seeded, so the in-memory season calendar must be rebuilt
+    invalidate_season_calendar()
+    invalidate_room_type_ids()
+    bump_data_version(*ALL_DATA_SETS)
+
+    # Compile the season calendar now, so overlapping season rules or dates fail at startup instead of when pricing
+    get_season_calendar()
 
     print("Database initialized successfully.")
 
@@ -29,10 +55,16 @@ def _create_tables():
                 id INTEGER PRIMARY KEY,
                 type_name TEXT NOT NULL UNIQUE,
                 base_price REAL NOT NULL CHECK(base_price >= 0),
-                max_count INTEGER NOT NULL CHECK(max_count > 0)
+                max_count INTEGER NOT NULL CHECK(max_count > 0),
+                version INTEGER NOT NULL DEFAULT 1
             )
         """)
 
+        # Databases created before optimistic concurrency get the version column, change log triggers then log it too
+        if _add_missing_column(cursor, 'RoomTypes', 'version', 'INTEGER NOT NULL DEFAULT 1'):
+            for operation in ('insert', 'update', 'delete'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS roomtypes_a{operation[0]}_changelog')
+
         # Create index on type_name for efficient lookups in RoomTypes table
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS roomtypes_idx_type_name ON RoomTypes(type_name)
@@ -77,7 +109,7 @@ def _create_tables():
             CREATE INDEX IF NOT EXISTS seasons_idx_multiplier ON Seasons(multiplier)
         """)
 
-        # Create SeasonDates table (Unique constraint to prevent overlapping dates)
+        # Create SeasonDates table (dated season overrides that replace the recurring rules on their days)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS SeasonDates (
                 id INTEGER PRIMARY KEY,
@@ -92,12 +124,149 @@ def _create_tables():
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS seasondates_idx_season_id ON SeasonDates(season_id)
         """)
+
+        # Create SeasonRules table (season repeated every year from start_day to end_day, MM-DD, may wrap into next year)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SeasonRules (
+                id INTEGER PRIMARY KEY,
+                season_id INTEGER NOT NULL,
+                start_day TEXT NOT NULL CHECK(start_day GLOB '[01][0-9]-[0-3][0-9]'),
+                end_day TEXT NOT NULL CHECK(end_day GLOB '[01][0-9]-[0-3][0-9]'),
+                FOREIGN KEY (season_id) REFERENCES Seasons(id)
+            )
+        """)
+
+        # Create Bookings table (historical bookings for analytics, price of the whole stay in øre)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Bookings (
+                id INTEGER PRIMARY KEY,
+                room_type_id INTEGER NOT NULL,
+                season_id INTEGER NOT NULL,
+                nights INTEGER NOT NULL CHECK(nights > 0),
+                price_ore INTEGER NOT NULL CHECK(price_ore >= 0),
+                FOREIGN KEY (room_type_id) REFERENCES RoomTypes(id),
+                FOREIGN KEY (season_id) REFERENCES Seasons(id)
+            )
+        """)
+
+        # Create covering index so aggregates per room type and season are computed from the index alone
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS bookings_idx_room_type_season ON Bookings(room_type_id, season_id, nights, price_ore)
+        """)
+
+        # Create RoomNights table (one row per occupied room per night, end date of a stay is the check-out day)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS RoomNights (
+                room_id INTEGER NOT NULL,
+                night DATE NOT NULL,
+                PRIMARY KEY (room_id, night),
+                FOREIGN KEY (room_id) REFERENCES Rooms(id)
+            ) WITHOUT ROWID
+        """)
+
+        # Create RoomTypeAvailability table (available room count per type, maintained by triggers on Rooms)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS RoomTypeAvailability (
+                room_type_id INTEGER PRIMARY KEY,
+                available_count INTEGER NOT NULL DEFAULT 0 CHECK(available_count >= 0),
+                FOREIGN KEY (room_type_id) REFERENCES RoomTypes(id)
+            )
+        """)
+
+        # Create counter row for every new room type
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS roomtypes_ai_availability AFTER INSERT ON RoomTypes
+            BEGIN
+                INSERT OR IGNORE INTO RoomTypeAvailability (room_type_id, available_count) VALUES (NEW.id, 0);
+            END
+        """)
+
+        # Count newly inserted available rooms
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS rooms_ai_availability AFTER INSERT ON Rooms
+            WHEN NEW.availability = 1
+            BEGIN
+                INSERT INTO RoomTypeAvailability (room_type_id, available_count) VALUES (NEW.room_type_id, 1)
+                ON CONFLICT(room_type_id) DO UPDATE SET available_count = available_count + 1;
+            END
+        """)
+
+        # Uncount deleted available rooms
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS rooms_ad_availability AFTER DELETE ON Rooms
+            WHEN OLD.availability = 1
+            BEGIN
+                UPDATE RoomTypeAvailability SET available_count = available_count - 1
+                WHERE room_type_id = OLD.room_type_id;
+            END
+        """)
+
+        # Move the count when a room changes availability or type
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS rooms_au_availability AFTER UPDATE OF availability, room_type_id ON Rooms
+            WHEN (OLD.availability = 1) != (NEW.availability = 1) OR OLD.room_type_id != NEW.room_type_id
+            BEGIN
+                UPDATE RoomTypeAvailability SET available_count = available_count - 1
+                WHERE room_type_id = OLD.room_type_id AND OLD.availability = 1;
+
+                INSERT INTO RoomTypeAvailability (room_type_id, available_count)
+                SELECT NEW.room_type_id, 1 WHERE NEW.availability = 1
+                ON CONFLICT(room_type_id) DO UPDATE SET available_count = available_count + 1;
+            END
+        """)
+
+        # Create ChangeLog table (every change to rooms, room types and room nights with a monotonic sequence number)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ChangeLog (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity TEXT NOT NULL,
+                entity_id INTEGER NOT NULL,
+                operation TEXT NOT NULL,
+                data TEXT NOT NULL,
+                changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+            )
+        """)
+
+        # Log changes with triggers so they are written in the same transaction as the change itself
+        # (entity, table, id column, JSON data, columns whose update is a change)
+        change_sources = (
+            ('room_type', 'RoomTypes', 'id',
+             "json_object('type_name', {row}.type_name, 'base_price', {row}.base_price, 'max_count', {row}.max_count, "
+             "'version', {row}.version)",
+             ('type_name', 'base_price', 'max_count', 'version')),
+            ('room', 'Rooms', 'id',
+             "json_object('room_type_id', {row}.room_type_id, 'availability', {row}.availability)",
+             ('room_type_id', 'availability')),
+            ('room_night', 'RoomNights', 'room_id', "json_object('night', {row}.night)", ()),
+        )
+        for entity, table, id_column, data, columns in change_sources:
+            events = [('insert', 'INSERT', 'NEW', ''), ('delete', 'DELETE', 'OLD', '')]
+            if columns:
+                events.append(('update', 'UPDATE', 'NEW',
+                               'WHEN ' + ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in columns)))
+            for operation, event, row, condition in events:
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {table.lower()}_a{operation[0]}_changelog AFTER {event} ON {table}
+                    {condition}
+                    BEGIN
+                        INSERT INTO ChangeLog (entity, entity_id, operation, data)
+                        VALUES ('{entity}', {row}.{id_column}, '{operation}', {data.format(row=row)});
+                    END
+                """)
     except Exception as e:
         print(f"Error creating tables: {e}")
         
     connection.commit()
     connection.close()
 
+# Adds a column to a table created before the column existed, returns True if it was added
+def _add_missing_column(cursor, table, column, definition):
+    cursor.execute(f'PRAGMA table_info({table})')
+    if any(row['name'] == column for row in cursor.fetchall()):
+        return False
+    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
 # Checks if initial data exists in database
 def _check_data_exists():
     connection = create_connection()
@@ -107,90 +276,130 @@ def _check_data_exists():
     connection.close()
     return result
 
-# Insert base room type name, price and max_count with BASE_PRICES and ROOM_COUNTS into RoomTypes table
-def _insert_room_type_data():
+# Checks if historical bookings exist in database
+def check_bookings_exist():
     connection = create_connection()
     cursor = connection.cursor()
-    
-    for type_name, base_price in BASE_PRICES.items():
-        max_count = ROOM_COUNTS.get(type_name, 0)
-        
-        cursor.execute("""
-            INSERT INTO RoomTypes (type_name, base_price, max_count) 
-            VALUES (?, ?, ?)
-        """, (type_name, base_price, max_count))
-            
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM Bookings) found")
+    result = cursor.fetchone()['found'] == 1
+    connection.close()
+    return result
+
+# Tunes a connection for bulk loading: no fsync per commit and a large in-memory cache
+def _configure_bulk_load(connection):
+    connection.execute('PRAGMA synchronous=OFF')
+    connection.execute('PRAGMA cache_size=-262144')
+    connection.execute('PRAGMA temp_store=MEMORY')
+
+# Inserts seasons and room types in a single transaction
+def _insert_base_data():
+    connection = create_connection()
+    _configure_bulk_load(connection)
+    cursor = connection.cursor()
+
+    _insert_season_multiplier_data(cursor)
+    _insert_room_type_data(cursor)
+
     connection.commit()
     connection.close()
 
+# Insert base room type name, price and max_count with BASE_PRICES and ROOM_COUNTS into RoomTypes table
+def _insert_room_type_data(cursor):
+    cursor.executemany("""
+        INSERT INTO RoomTypes (type_name, base_price, max_count)
+        VALUES (?, ?, ?)
+    """, [(type_name, base_price, ROOM_COUNTS.get(type_name, 0)) for type_name, base_price in BASE_PRICES.items()])
+
 # Insert season multiplier data with SEASONS into the Seasons table
-def _insert_season_multiplier_data():
+def _insert_season_multiplier_data(cursor):
+    cursor.executemany("""
+        INSERT INTO Seasons (season_type, multiplier)
+        VALUES (?, ?)
+    """, list(SEASONS.items()))
+
+# Insert recurring season rules with SEASON_RULES into SeasonRules table if it is empty
+def _insert_missing_season_rules():
     connection = create_connection()
     cursor = connection.cursor()
-    
-    for season_type, multiplier in SEASONS.items():
-        cursor.execute("""
-            INSERT INTO Seasons (season_type, multiplier) 
-            VALUES (?, ?)
-        """, (season_type, multiplier))
-            
-    connection.commit()
+    cursor.execute("SELECT COUNT(*) count FROM SeasonRules")
+    if cursor.fetchone()['count'] == 0:
+        cursor.executemany("""
+            INSERT INTO SeasonRules (season_id, start_day, end_day)
+            VALUES (?, ?, ?)
+        """, SEASON_RULES)
+        connection.commit()
     connection.close()
 
-# Insert season dates into SeasonDates table
-def _insert_season_dates():
+# Builds (room_type_id, availability) rows from an inventory CSV with a "Room Type" column
+def _read_csv_data(cursor, csv_path):
+    # pandas is only needed for seeding, so it is imported here to keep it out of service startup
+    import pandas as pd
+
+    data = pd.read_csv(csv_path, usecols=['Room Type'])
+
+    # Resolve room type ids once instead of querying RoomTypes for every row
+    cursor.execute("SELECT id, type_name FROM RoomTypes")
+    room_type_ids = {row['type_name']: row['id'] for row in cursor.fetchall()}
+    room_types = data.loc[data['Room Type'].isin(room_type_ids.keys()), 'Room Type']
+
+    # The first 80% of each type's total_count (in file order) are available, the rest are occupied
+    room_numbers = room_types.groupby(room_types).cumcount() + 1
+    available_limits = room_types.map({type_name: int(count * 0.8) for type_name, count in ROOM_COUNTS.items()})
+    availability = (room_numbers <= available_limits.fillna(0)).astype(int)
+
+    return list(zip(room_types.map(room_type_ids).tolist(), availability.tolist()))
+
+# Reads rooms from an inventory CSV and inserts them with one executemany in one transaction, returns row count
+def import_rooms_csv(csv_path):
     connection = create_connection()
+    _configure_bulk_load(connection)
     cursor = connection.cursor()
 
-    for season_id, start_date, end_date in SEASON_DATES:
-        cursor.execute("""SELECT id FROM Seasons WHERE id = ?""", (season_id,))
-                       
-        cursor.execute("""
-            INSERT INTO SeasonDates (season_id, start_date, end_date) 
-            VALUES (?, ?, ?)
-        """, (season_id, start_date, end_date,))
-    
+    rows = _read_csv_data(cursor, csv_path)
+    cursor.executemany("""
+        INSERT INTO Rooms (room_type_id, availability)
+        VALUES (?, ?)
+    """, rows)
+
     connection.commit()
     connection.close()
+    bump_data_version(ROOMS)
+    return len(rows)
+
+# Builds (room_type_id, season_id, nights, price_ore) rows from a CSV with "Room Type", "Days Rented", "Season" and "Price"
+def _read_bookings_csv_data(cursor, csv_path):
+    import pandas as pd
+
+    data = pd.read_csv(csv_path, usecols=['Room Type', 'Days Rented', 'Season', 'Price'])
+
+    # Resolve room type and season ids once, rows with unknown names are skipped
+    cursor.execute("SELECT id, type_name FROM RoomTypes")
+    room_type_ids = {row['type_name']: row['id'] for row in cursor.fetchall()}
+    cursor.execute("SELECT id, season_type FROM Seasons")
+    season_ids = {row['season_type']: row['id'] for row in cursor.fetchall()}
 
-# Reads and inserts room data from CSV
-def _read_csv_data():
-    # Read CSV file by specifying the CSV file path
-    csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                             'csv/international_names_with_rooms_1000.csv')
-    data = pd.read_csv(csv_path)
-    
+    room_type_id = data['Room Type'].map(room_type_ids)
+    season_id = data['Season'].str.upper().map(season_ids)
+    known = room_type_id.notna() & season_id.notna()
+    price_ore = (data.loc[known, 'Price'] * 100).round().astype('int64')
+
+    return list(zip(room_type_id[known].astype('int64').tolist(), season_id[known].astype('int64').tolist(),
+                    data.loc[known, 'Days Rented'].astype('int64').tolist(), price_ore.tolist()))
+
+# Reads historical bookings from a CSV and inserts them with one executemany in one transaction, returns row count
+# Not part of init_db, since it needs pandas: run once with python -m database.seed --bookings
+def import_bookings_csv(csv_path):
     connection = create_connection()
+    _configure_bulk_load(connection)
     cursor = connection.cursor()
 
-    # Dictionary to keep track of the number of rooms inserted for each type
-    room_counts = {type_name: 0 for type_name in ROOM_COUNTS.keys()}
-
-    # Iterate over each row in the CSV file and insert the room type into the RoomTypes table
-    for _, row in data.iterrows():
-        room_type_name = row['Room Type']
-        
-        # Check if room type already exists in the RoomTypes table
-        cursor.execute("SELECT id FROM RoomTypes WHERE type_name = ?", 
-                       (room_type_name,))
-        room_type = cursor.fetchone()
-        
-        # If room type exists, insert room data into Rooms table
-        if room_type:
-            room_type_id = room_type['id']
-            
-            # Increment the count for this room type
-            room_counts[room_type_name] += 1
-            
-            # Calculate availability based on total_count
-            total_count = ROOM_COUNTS[room_type_name]
-            availability = 1 if room_counts[room_type_name] <= int(total_count * 0.8) else 0
-            
-            # Insert the room with the calculated availability
-            cursor.execute("""
-                INSERT INTO Rooms (room_type_id, availability) 
-                VALUES (?, ?)
-            """, (room_type_id, availability))
+    rows = _read_bookings_csv_data(cursor, csv_path)
+    cursor.executemany("""
+        INSERT INTO Bookings (room_type_id, season_id, nights, price_ore)
+        VALUES (?, ?, ?, ?)
+    """, rows)
 
     connection.commit()
     connection.close()
+    bump_data_version(BOOKINGS)
+    return len(rows)
@@ -0,0 +1,89 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+
+# Statements slower than this are logged (milliseconds, unset disables the slow query log)
+SLOW_QUERY_THRESHOLD_MS = os.environ.get('SLOW_QUERY_THRESHOLD_MS')
+
+logger = logging.getLogger('room_inventory.sql')
+
+# Database work done by the current request (None outside of instrumented requests)
+_request_stats = ContextVar('request_stats', default=None)
+
+_totals = {"connections_created": 0, "connections_acquired": 0, "statements": 0, "sql_seconds": 0.0}
+_totals_lock = threading.Lock()
+
+# Starts counting database work for the current request and returns the stats dict
+# (snapshot_taken_at is the epoch time of the oldest read snapshot the request read from, None if it used none)
+def start_request_stats():
+    stats = {"connections_created": 0, "connections_acquired": 0, "statements": 0, "sql_seconds": 0.0,
+             "snapshot_taken_at": None}
+    _request_stats.set(stats)
+    return stats
+
+# Returns the stats dict of the current request, or None
+def get_request_stats():
+    return _request_stats.get()
+
+# Returns process-wide totals since start
+def get_totals():
+    with _totals_lock:
+        return dict(_totals)
+
+def _record(name, amount=1):
+    with _totals_lock:
+        _totals[name] += amount
+    stats = _request_stats.get()
+    if stats is not None:
+        stats[name] += amount
+
+# Counts a newly opened SQLite connection
+def record_connection_created():
+    _record("connections_created")
+
+# Counts a connection handed out by the pool
+def record_connection_acquired():
+    _record("connections_acquired")
+
+# Remembers that the current request read from a snapshot taken at taken_at (epoch seconds)
+def record_snapshot_read(taken_at):
+    stats = _request_stats.get()
+    if stats is not None and (stats["snapshot_taken_at"] is None or taken_at < stats["snapshot_taken_at"]):
+        stats["snapshot_taken_at"] = taken_at
+
+# Counts an executed statement and its duration, logging it if it exceeds the slow query threshold
+def _record_statement(sql, elapsed):
+    _record("statements")
+    _record("sql_seconds", elapsed)
+    if SLOW_QUERY_THRESHOLD_MS is not None and elapsed * 1000 >= float(SLOW_QUERY_THRESHOLD_MS):
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(sql.split()))
+
+# Cursor that times every execute/executemany call
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_statement(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_statement(sql, time.perf_counter() - started)
+
+# Connection whose cursors (and shortcut execute calls) are instrumented
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,34 @@
+import argparse
+import time
+from database.connection import set_database_path
+from database.initialization import DEFAULT_CSV_PATH, check_bookings_exist, import_bookings_csv, import_rooms_csv, init_db
+
+# Command line entry point: python -m database.seed [--database PATH] inventory.csv [more.csv ...]
+# With --bookings the historical bookings of the CSV files (default: the bundled CSV) are imported instead of rooms
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk import room inventory CSV files (needs a "Room Type" column)')
+    parser.add_argument('csv_paths', nargs='*', help='inventory CSV files to import')
+    parser.add_argument('--database', help='SQLite database file (default: ROOM_INVENTORY_DB or database/room_inventory.db)')
+    parser.add_argument('--bookings', action='store_true',
+                        help='import historical bookings ("Room Type", "Days Rented", "Season", "Price" columns) '
+                             'for the analytics endpoints, skipped if the database already has bookings')
+    args = parser.parse_args()
+    if not args.csv_paths and not args.bookings:
+        parser.error('at least one CSV file is required')
+
+    if args.database:
+        set_database_path(args.database)
+
+    # Create tables and base data (seasons, room types) if missing, without the default inventory
+    init_db(csv_path=None)
+
+    if args.bookings and check_bookings_exist():
+        print("Bookings already imported, nothing to do.")
+        raise SystemExit(0)
+
+    import_csv, unit = (import_bookings_csv, 'bookings') if args.bookings else (import_rooms_csv, 'rooms')
+    for csv_path in args.csv_paths or [DEFAULT_CSV_PATH]:
+        started = time.perf_counter()
+        rows = import_csv(csv_path)
+        elapsed = time.perf_counter() - started
+        print(f"{csv_path}: {rows} {unit} in {elapsed:.3f}s ({rows / elapsed if elapsed else 0:,.0f} rows/sec)")
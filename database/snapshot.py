@@ -0,0 +1,169 @@
+import atexit
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from database import connection as primary
+from database.connection import POOL_SIZE, POOL_TIMEOUT, ConnectionPool, create_connection, get_connection
+from database.data_versions import ALL_DATA_SETS, get_data_versions
+from database.instrumentation import record_connection_acquired, record_snapshot_read
+
+# Seconds between refreshes of the read snapshot, i.e. how stale snapshot reads may get
+# (can be overridden with READ_SNAPSHOT_SECONDS, 0 disables the snapshot and all reads go to the primary database)
+READ_SNAPSHOT_SECONDS = float(os.environ.get('READ_SNAPSHOT_SECONDS', 0))
+
+logger = logging.getLogger('room_inventory.snapshot')
+
+_snapshot = None
+_snapshot_pid = None
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_sequence = itertools.count(1)
+_stats = {"refreshes": 0, "unchanged": 0, "failures": 0}
+
+# Read-only copy of the primary database made with the SQLite backup API, served by its own connection pool
+class Snapshot:
+    def __init__(self, source_path, path, versions, taken_at):
+        self.source_path = source_path
+        self.path = path
+        self.versions = versions
+        self.taken_at = taken_at
+        self.pool = ConnectionPool(POOL_SIZE, POOL_TIMEOUT, connect=lambda: create_connection(read_only_path=path))
+        self.users = 0
+        self.retired = False
+
+    # Closes the connections and deletes the file, must only be called when no reader uses the snapshot
+    def remove(self):
+        self.pool.close(retire=True)
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+# Copies the primary database into a new snapshot file, returns the snapshot
+def _take_snapshot():
+    # Versions are read before copying, so the snapshot holds at least the data of these versions
+    versions = dict(zip(ALL_DATA_SETS, get_data_versions(ALL_DATA_SETS)))
+    taken_at = time.time()
+    source_path = primary.DATABASE_PATH
+    path = f"{source_path}.snapshot-{os.getpid()}-{next(_sequence)}"
+
+    target = sqlite3.connect(path)
+    try:
+        with get_connection() as source:
+            source.backup(target)
+
+        # Immutable read-only connections cannot use WAL, which needs a shared-memory file
+        target.execute('PRAGMA journal_mode=DELETE')
+    except Exception:
+        target.close()
+        os.remove(path)
+        raise
+    target.close()
+    return Snapshot(source_path, path, versions, taken_at)
+
+# Replaces the snapshot with a fresh copy of the primary database, unless nothing was written since the last copy
+def refresh_snapshot():
+    global _snapshot
+    with _refresh_lock:
+        current = _snapshot
+        if (current is not None and current.source_path == primary.DATABASE_PATH
+                and tuple(current.versions.values()) == get_data_versions(ALL_DATA_SETS)):
+            current.taken_at = time.time()
+            _stats["unchanged"] += 1
+            return
+
+        snapshot = _take_snapshot()
+        with _lock:
+            previous, _snapshot = _snapshot, snapshot
+            _stats["refreshes"] += 1
+            if previous is not None:
+                previous.retired = True
+                if previous.users == 0:
+                    previous.remove()
+
+# Refreshes the snapshot every READ_SNAPSHOT_SECONDS, a failed refresh keeps serving the previous snapshot
+def _refresh_periodically():
+    while True:
+        time.sleep(READ_SNAPSHOT_SECONDS)
+        try:
+            refresh_snapshot()
+        except Exception:
+            _stats["failures"] += 1
+            logger.exception("Refreshing the read snapshot failed")
+
+# Returns the current snapshot marked as in use, taking the first one (and starting the refresher) on first use
+def _acquire_snapshot():
+    global _snapshot, _snapshot_pid
+    with _lock:
+        # A forked worker takes its own snapshot, the inherited one belongs to the parent process
+        if _snapshot_pid != os.getpid():
+            _snapshot_pid = os.getpid()
+            _snapshot = None
+            threading.Thread(target=_refresh_periodically, name='read-snapshot', daemon=True).start()
+        snapshot = _snapshot
+
+    if snapshot is None or snapshot.source_path != primary.DATABASE_PATH:
+        refresh_snapshot()
+
+    with _lock:
+        snapshot = _snapshot
+        snapshot.users += 1
+    return snapshot
+
+# Marks a snapshot as no longer used, removing it if it was replaced in the meantime
+def _release_snapshot(snapshot):
+    with _lock:
+        snapshot.users -= 1
+        if snapshot.retired and snapshot.users == 0:
+            snapshot.remove()
+
+# Borrows a connection for reads that may be up to READ_SNAPSHOT_SECONDS stale (catalog lists, pricing)
+# Served from the snapshot when enabled, so these reads never wait on the primary's locks; writes use get_connection
+@contextmanager
+def get_read_connection():
+    if not READ_SNAPSHOT_SECONDS:
+        with get_connection() as connection:
+            yield connection
+        return
+
+    snapshot = _acquire_snapshot()
+    try:
+        record_snapshot_read(snapshot.taken_at)
+        connection = snapshot.pool.acquire()
+        record_connection_acquired()
+        try:
+            yield connection
+        finally:
+            snapshot.pool.release(connection)
+    finally:
+        _release_snapshot(snapshot)
+
+# Returns the data versions that reads from get_read_connection reflect (the snapshot's when enabled)
+# Caches of such reads must be keyed on these, otherwise a stale read could be cached under a newer version
+def get_read_data_versions(data_sets):
+    if not READ_SNAPSHOT_SECONDS:
+        return get_data_versions(data_sets)
+
+    snapshot = _acquire_snapshot()
+    try:
+        record_snapshot_read(snapshot.taken_at)
+        return tuple(snapshot.versions[data_set] for data_set in data_sets)
+    finally:
+        _release_snapshot(snapshot)
+
+# Returns snapshot metrics (refreshes, unchanged refreshes, failures and the age of the current snapshot)
+def snapshot_stats():
+    snapshot = _snapshot
+    age = time.time() - snapshot.taken_at if snapshot is not None else 0.0
+    return {**_stats, "age_seconds": round(age, 3)}
+
+# Deletes the snapshot file of this process on exit
+@atexit.register
+def _remove_snapshot():
+    with _lock:
+        if _snapshot is not None and _snapshot_pid == os.getpid():
+            _snapshot.remove()
@@ -0,0 +1,39 @@
+import multiprocessing
+import os
+
+# Server mode: sync (gthread workers, one thread per active connection) or async (event loop workers, see asgi.py)
+SERVER_MODE = os.environ.get('SERVER_MODE', 'sync')
+
+# Production server settings (can be overridden with environment variables)
+bind = f"0.0.0.0:{os.environ.get('PORT', 5002)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+if SERVER_MODE == 'async':
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    wsgi_app = 'asgi:app'
+else:
+    worker_class = 'gthread'
+    wsgi_app = 'wsgi:app'
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 75 if SERVER_MODE == 'async' else 5))
+
+# Change feed streams and long-polls hold a request thread in sync mode, leave half of the threads to other requests
+os.environ.setdefault('CHANGE_FEED_MAX_WAITERS', str(max(threads // 2, 1)))
+accesslog = os.environ.get('ACCESS_LOG')
+
+# Runs init_db once in the master process before any worker is forked
+def on_starting(server):
+    from database.connection import close_pool
+    from database.initialization import init_db
+
+    init_db()
+
+    # Workers must open their own connections instead of inheriting the master's
+    close_pool()
+
+# With several workers, caches in one worker must notice writes committed by the others
+def post_fork(server, worker):
+    if workers > 1:
+        from database.connection import create_connection
+        from database.data_versions import watch_external_changes
+
+        watch_external_changes(create_connection())
@@ -0,0 +1,75 @@
+from datetime import date
+from database.snapshot import get_read_connection
+from repositories.season_calendar import get_season_calendar
+
+# Dimensions bookings can be grouped by, with the fields identifying a group
+GROUP_BY_FIELDS = {
+    'room_type': ('room_type_id', 'type_name'),
+    'season': ('season_type',),
+}
+
+# Divides øre amounts and rounds half up to whole øre, returned in currency units
+def _ore_ratio(numerator, denominator):
+    return (numerator * 2 + denominator) // (denominator * 2) / 100 if denominator else None
+
+# Gets bookings, nights and revenue for every room type and season (zero without bookings),
+# aggregated with one pass over the covering index
+def _db_get_booking_cells(room_type_id=None):
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT RoomTypes.id as room_type_id, RoomTypes.type_name, RoomTypes.max_count, Seasons.season_type,
+                   COALESCE(cells.bookings, 0) as bookings, COALESCE(cells.nights, 0) as nights,
+                   COALESCE(cells.revenue_ore, 0) as revenue_ore
+            FROM RoomTypes
+            CROSS JOIN Seasons
+            LEFT JOIN (
+                SELECT room_type_id, season_id, COUNT(*) as bookings, SUM(nights) as nights, SUM(price_ore) as revenue_ore
+                FROM Bookings
+                WHERE ? IS NULL OR room_type_id = ?
+                GROUP BY room_type_id, season_id
+            ) as cells ON cells.room_type_id = RoomTypes.id AND cells.season_id = Seasons.id
+            WHERE ? IS NULL OR RoomTypes.id = ?
+            ORDER BY RoomTypes.id, Seasons.id
+        """, (room_type_id, room_type_id, room_type_id, room_type_id))
+        return [dict(row) for row in cursor.fetchall()]
+
+# Sums cells into groups keyed by the group_by dimensions, keeping the order of first appearance
+def _roll_up(cells, group_by, columns):
+    fields = [field for dimension in group_by for field in GROUP_BY_FIELDS[dimension]]
+    groups = {}
+    for cell in cells:
+        key = tuple(cell[field] for field in fields)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {**{field: cell[field] for field in fields}, **{column: 0 for column in columns}}
+        for column in columns:
+            group[column] += cell[column]
+    return list(groups.values())
+
+# Gets bookings, nights, revenue and average daily rate (revenue per night) grouped by room type and/or season
+def db_get_revenue(group_by=('room_type', 'season'), room_type_id=None):
+    groups = _roll_up(_db_get_booking_cells(room_type_id), group_by, ('bookings', 'nights', 'revenue_ore'))
+    for group in groups:
+        revenue_ore = group.pop('revenue_ore')
+        group['revenue'] = revenue_ore / 100
+        group['adr'] = _ore_ratio(revenue_ore, group['nights'])
+    return groups
+
+# Gets booked nights against capacity (max_count × days of each season in year) grouped by room type and/or season
+# The bookings carry no dates, so they are taken to cover one year of the season calendar
+def db_get_occupancy(year, group_by=('room_type', 'season'), room_type_id=None):
+    season_days = {}
+    for nights, _, season in get_season_calendar().stay_segments(date(year, 1, 1), date(year, 12, 31)):
+        if season is not None:
+            season_days[season['season_type']] = season_days.get(season['season_type'], 0) + nights
+
+    cells = _db_get_booking_cells(room_type_id)
+    for cell in cells:
+        cell['capacity_nights'] = cell['max_count'] * season_days.get(cell['season_type'], 0)
+
+    groups = _roll_up(cells, group_by, ('nights', 'capacity_nights'))
+    for group in groups:
+        capacity = group['capacity_nights']
+        group['occupancy_rate'] = round(group['nights'] / capacity, 4) if capacity else None
+    return groups
@@ -1,73 +1,190 @@
-from database.connection import create_connection
-from datetime import timedelta, datetime
-from repositories.room_type_repository import db_get_room_base_price
-
-# Fetch season multiplier based on dates (a date can belong to multiple seasons)
-def _db_get_season_multiplier(date):
-    connection = create_connection()
-    cursor = connection.cursor()
-
-    # Format date properly for SQLite comparison
-    formatted_date = date.strftime('%Y-%m-%d')
-
-    cursor.execute('''
-        SELECT multiplier FROM Seasons
-        INNER JOIN SeasonDates ON Seasons.id = SeasonDates.season_id
-        WHERE start_date <= ? AND end_date >= ?
-    ''', (formatted_date, formatted_date))
-
-    result = cursor.fetchone()
-    connection.close()
-    
-    return result['multiplier'] if result else 1.0 # Default multiplier is 1 
-
-# Calculate total price for stay duration (a stay can span multiple seasons)
-def db_calculate_total_price(room_type_id, start_date, end_date):
+import threading
+from decimal import ROUND_HALF_UP, Decimal
+from database.data_versions import ROOM_TYPES
+from database.snapshot import get_read_connection, get_read_data_versions
+from repositories.room_type_repository import db_get_room_base_price, db_get_room_types
+from repositories.season_calendar import DEFAULT_MULTIPLIER, get_season_calendar
+
+# Converts a DKK amount to integer øre without float drift
+def _to_ore(amount):
+    return int((Decimal(str(amount)) * 100).to_integral_value(ROUND_HALF_UP))
+
+# Converts a season multiplier to integer basis points (1.2 -> 12000)
+def _to_basis_points(multiplier):
+    return int((Decimal(str(multiplier)) * 10000).to_integral_value(ROUND_HALF_UP))
+
+# Nightly rate in øre for a base price in øre and a multiplier in basis points, rounded half up to whole øre
+def _nightly_rate_ore(base_ore, multiplier_basis_points):
+    return (base_ore * multiplier_basis_points + 5000) // 10000
+
+# Calculate price for stay duration per season segment: nights × nightly rate, O(segments) in integer øre
+# Returns None if the room type does not exist, price None if the stay costs nothing
+def db_calculate_price_breakdown(room_type_id, start_date, end_date):
     base_price = db_get_room_base_price(room_type_id)
-    total_price = 0
-    
-    # Iterate over each date from start_date to end_date and calculate price per day and add to total_price 
-    iterate_date = start_date
-    while iterate_date <= end_date:
-        multiplier = _db_get_season_multiplier(iterate_date)
-        daily_price = base_price * multiplier
-        total_price += daily_price
-        iterate_date += timedelta(days=1)
-    
-    return total_price if total_price > 0 else None
+    if base_price is None:
+        return None
+
+    base_ore = _to_ore(base_price)
+    total_ore = 0
+    breakdown = []
+    for nights, multiplier, season in get_season_calendar().stay_segments(start_date, end_date):
+        nightly_rate = _nightly_rate_ore(base_ore, _to_basis_points(multiplier))
+        subtotal = nights * nightly_rate
+        total_ore += subtotal
+        breakdown.append({
+            "season_type": season["season_type"] if season else None,
+            "multiplier": multiplier,
+            "nights": nights,
+            "nightly_rate": nightly_rate / 100,
+            "subtotal": subtotal / 100
+        })
+
+    if total_ore <= 0:
+        return {"price": None, "breakdown": []}
+    return {"price": total_ore / 100, "breakdown": breakdown}
+
+# Calculate prices for many (room_type_id, start_date, end_date) quotes in one pass
+def db_calculate_batch_prices(quotes, room_types=None):
+    # NumPy is imported on first batch request to keep it out of service startup
+    import numpy as np
+
+    # Load all base prices with one query instead of one lookup per quote
+    if room_types is None:
+        room_types = db_get_room_types()
+    base_prices = {room_type['id']: _to_ore(room_type['base_price']) for room_type in room_types}
+    calendar = get_season_calendar()
+    results = [None] * len(quotes)
+
+    # Group quotes sharing a date range so the season segments are resolved once per range
+    quotes_by_range = {}
+    for index, (room_type_id, start_date, end_date) in enumerate(quotes):
+        quotes_by_range.setdefault((start_date, end_date), []).append(index)
+
+    for (start_date, end_date), indexes in quotes_by_range.items():
+        known = [index for index in indexes if quotes[index][0] in base_prices]
+        segments = calendar.stay_segments(start_date, end_date)
+        if not known or not segments:
+            continue
+
+        # Nightly rate matrix (room type × segment) in øre, dot-multiplied with the nights per segment
+        base_vector = np.array([base_prices[quotes[index][0]] for index in known], dtype=np.int64)
+        multipliers = np.array([_to_basis_points(multiplier) for _, multiplier, _ in segments], dtype=np.int64)
+        nights = np.array([segment_nights for segment_nights, _, _ in segments], dtype=np.int64)
+        nightly_rates = (np.outer(base_vector, multipliers) + 5000) // 10000
+        totals = nightly_rates @ nights
+
+        for index, total in zip(known, totals.tolist()):
+            results[index] = total / 100 if total > 0 else None
+
+    return results
+
+# Nightly rates in øre of every room type for every day of the season calendar horizon (room type × day matrix)
+# Built as the outer product of base prices and nightly multipliers; price changes rebuild the rows of the changed
+# room types, a recompiled season calendar rebuilds the columns of the days whose multiplier changed
+class RateGrid:
+    def __init__(self):
+        self.first = None
+        self.room_types = []
+        self.base_ore = None
+        self.multipliers = None
+        self.rates = None
+        self._calendar = None
+        self._room_type_versions = None
+        self._lock = threading.Lock()
+        self._stats = {"builds": 0, "rows_rebuilt": 0, "columns_rebuilt": 0}
+
+    # Nightly multipliers in basis points for every day of the calendar horizon, looked up through its day index
+    def _compile_multipliers(self, np, calendar):
+        segment_multipliers = np.array([_to_basis_points(multiplier) for _, _, multiplier, _ in calendar.segments],
+                                       dtype=np.int64)
+        return segment_multipliers[np.frombuffer(calendar.days, dtype=np.intc)]
+
+    # Applies a (re)compiled season calendar, only days whose multiplier changed are recalculated
+    def _apply_calendar(self, np, calendar):
+        multipliers = self._compile_multipliers(np, calendar)
+        if self.rates is not None and self.first == calendar.first and len(multipliers) == len(self.multipliers):
+            changed = np.flatnonzero(multipliers != self.multipliers)
+            self.rates[:, changed] = (np.outer(self.base_ore, multipliers[changed]) + 5000) // 10000
+            self._stats["columns_rebuilt"] += len(changed)
+        else:
+            self.rates = (np.outer(self.base_ore, multipliers) + 5000) // 10000
+            self._stats["builds"] += 1
+        self.first = calendar.first
+        self.multipliers = multipliers
+        self._calendar = calendar
+
+    # Reloads the room types, rows of unchanged base prices are copied and only changed ones recalculated
+    def _apply_room_types(self, np, room_types):
+        previous = {room_type["id"]: index for index, room_type in enumerate(self.room_types)}
+        base_ore = np.array([_to_ore(room_type["base_price"]) for room_type in room_types], dtype=np.int64)
+        rates = np.empty((len(room_types), len(self.multipliers)), dtype=np.int64)
+        for index, room_type in enumerate(room_types):
+            row = previous.get(room_type["id"])
+            if row is not None and self.base_ore[row] == base_ore[index]:
+                rates[index] = self.rates[row]
+            else:
+                rates[index] = (base_ore[index] * self.multipliers + 5000) // 10000
+                self._stats["rows_rebuilt"] += 1
+        self.room_types = [{"id": room_type["id"], "type_name": room_type["type_name"]} for room_type in room_types]
+        self.base_ore = base_ore
+        self.rates = rates
+
+    # Brings the grid up to date with the season calendar and the room types
+    def _refresh(self, np):
+        if self.base_ore is None:
+            self.base_ore = np.zeros(0, dtype=np.int64)
+
+        calendar = get_season_calendar()
+        if calendar is not self._calendar:
+            self._apply_calendar(np, calendar)
+
+        # Room types are only read again after a write bumped their data version
+        versions = get_read_data_versions((ROOM_TYPES,))
+        if versions != self._room_type_versions:
+            with get_read_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute('SELECT id, type_name, base_price FROM RoomTypes ORDER BY id')
+                room_types = cursor.fetchall()
+            self._apply_room_types(np, room_types)
+            self._room_type_versions = versions
+
+    # Returns (room types, nightly rates in øre as a room type × day array) for days nights from start_date
+    def rates_for(self, start_date, days):
+        # NumPy is imported on first grid request to keep it out of service startup
+        import numpy as np
+
+        first = start_date.toordinal()
+        with self._lock:
+            self._refresh(np)
+            offset = first - self.first
+            if 0 <= offset and offset + days <= len(self.multipliers):
+                return list(self.room_types), self.rates[:, offset:offset + days].copy()
+
+            # Days outside the calendar horizon use the default multiplier, computed for this request only
+            multipliers = np.full(days, _to_basis_points(DEFAULT_MULTIPLIER), dtype=np.int64)
+            start = max(offset, 0)
+            stop = min(offset + days, len(self.multipliers))
+            if start < stop:
+                multipliers[start - offset:stop - offset] = self.multipliers[start:stop]
+            return list(self.room_types), (np.outer(self.base_ore, multipliers) + 5000) // 10000
+
+    # Returns grid metrics (full builds, rows and columns rebuilt incrementally)
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+rate_grid = RateGrid()
+
+# Gets the nightly rate of every room type for days nights from start_date
+# Returns (room types [{"id", "type_name"}], rates in DKK as one list of days floats per room type)
+def db_get_price_grid(start_date, days):
+    room_types, rates = rate_grid.rates_for(start_date, days)
+    return room_types, (rates / 100).tolist()
 
 # Get season by date
 def db_get_season_by_date(date):
-    connection = create_connection()
-    cursor = connection.cursor()
-
     try:
-        # Convert input date to string in YYYY-MM-DD format (SQLite supports text comparisons)
-        date_str = date if isinstance(date, str) else date.strftime("%Y-%m-%d")
-        
-        cursor.execute('''
-            SELECT Seasons.id, Seasons.season_type, SeasonDates.start_date, SeasonDates.end_date
-            FROM Seasons
-            INNER JOIN SeasonDates ON Seasons.id = SeasonDates.season_id
-            WHERE start_date <= ? AND end_date >= ?
-        ''', (date_str, date_str))
-
-        result = cursor.fetchone()
-        
-        # Close the connection
-        connection.close()
-
-        if not result:
-            return None
-
-        # Return result as a dictionary with clear keys
-        return {
-            "id": result["id"],
-            "season_type": result["season_type"],
-            "start_date": result["start_date"],
-            "end_date": result["end_date"]
-        }
-
+        return get_season_calendar().season_for(date)
     except Exception as e:
         print(e)
         return {"error": str(e)}
@@ -75,19 +192,18 @@ def db_get_season_by_date(date):
 
 # Get season type by id
 def db_get_season_by_id(id):
-    connection = create_connection()
-    cursor = connection.cursor()
+    result = None
 
     try:
-        cursor.execute('''
-            SELECT * FROM Seasons
-            WHERE id = ?
-        ''', (id,))
-
-        result = cursor.fetchone()
-        connection.close()
+        with get_read_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute('''
+                SELECT * FROM Seasons
+                WHERE id = ?
+            ''', (id,))
+            result = cursor.fetchone()
 
     except Exception as e:
         print(e)
-    
+
     return dict(result) if result else None
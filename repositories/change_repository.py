@@ -0,0 +1,44 @@
+import json
+from database.connection import get_connection
+
+# Gets up to limit changes with a sequence number greater than since, oldest first
+def db_get_changes(since, limit):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT seq, entity, entity_id, operation, data, changed_at
+            FROM ChangeLog
+            WHERE seq > ?
+            ORDER BY seq
+            LIMIT ?
+        """, (since, limit))
+        changes = [dict(row) for row in cursor.fetchall()]
+
+    for change in changes:
+        change['data'] = json.loads(change['data'])
+    return changes
+
+# Gets the oldest and latest sequence numbers still in the change log (0, 0 if it is empty)
+def db_get_change_bounds():
+    with get_connection() as connection:
+        cursor = connection.cursor()
+
+        # AUTOINCREMENT keeps the latest sequence number in sqlite_sequence even after pruning
+        cursor.execute("""
+            SELECT (SELECT MIN(seq) FROM ChangeLog) as oldest,
+                   (SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog') as latest
+        """)
+        result = cursor.fetchone()
+    latest = result['latest'] or 0
+    return (result['oldest'] or latest + 1) - 1, latest
+
+# Deletes all but the newest keep changes and returns the number of deleted changes
+def db_prune_changes(keep):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            DELETE FROM ChangeLog
+            WHERE seq <= (SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog') - ?
+        """, (keep,))
+        connection.commit()
+        return cursor.rowcount
@@ -0,0 +1,85 @@
+from database.idempotency_database import get_idempotency_connection
+
+# Registers the first use of an idempotency key for a request started at started_at, returns None if the key was
+# inserted, otherwise its stored row (fingerprint, status, headers, body, started_at); status is None while running
+# An expired key, or one left running for stale_seconds by a worker that died, is replaced
+def db_begin_idempotent_request(key, fingerprint, started_at, expires_at, stale_seconds):
+    with get_idempotency_connection() as connection:
+        cursor = connection.cursor()
+
+        # BEGIN IMMEDIATE takes the write lock (of the key database only) before reading, so two workers cannot both
+        # insert the key
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute("""
+            DELETE FROM IdempotencyKeys
+            WHERE key = ? AND (expires_at <= ? OR (status IS NULL AND started_at <= ?))
+        """, (key, started_at, started_at - stale_seconds))
+        cursor.execute("""
+            SELECT fingerprint, status, headers, body, started_at
+            FROM IdempotencyKeys
+            WHERE key = ?
+        """, (key,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("""
+                INSERT INTO IdempotencyKeys (key, fingerprint, started_at, expires_at)
+                VALUES (?, ?, ?, ?)
+            """, (key, fingerprint, started_at, expires_at))
+        connection.commit()
+    return dict(row) if row else None
+
+# Gets the stored row of an idempotency key, or None if it is unknown
+def db_get_idempotent_request(key):
+    with get_idempotency_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT fingerprint, status, headers, body, started_at
+            FROM IdempotencyKeys
+            WHERE key = ?
+        """, (key,))
+        row = cursor.fetchone()
+    return dict(row) if row else None
+
+# Stores the response of the request that inserted the key at started_at, returns False if the key is no longer its own
+def db_complete_idempotent_request(key, started_at, status, headers, body):
+    with get_idempotency_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            UPDATE IdempotencyKeys
+            SET status = ?, headers = ?, body = ?
+            WHERE key = ? AND started_at = ? AND status IS NULL
+        """, (status, headers, body, key, started_at))
+        completed = cursor.rowcount > 0
+        connection.commit()
+    return completed
+
+# Deletes a key whose request (started at started_at) failed, so a retry runs again
+def db_delete_idempotent_request(key, started_at):
+    with get_idempotency_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM IdempotencyKeys WHERE key = ? AND started_at = ? AND status IS NULL',
+                       (key, started_at))
+        connection.commit()
+
+# Deletes keys expired at now and all but the max_keys newest, returns (expired, evicted) counts
+def db_prune_idempotency_keys(now, max_keys):
+    with get_idempotency_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM IdempotencyKeys WHERE expires_at <= ?', (now,))
+        expired = cursor.rowcount
+
+        # Both statements walk the expires_at index, keys expire in the order they were inserted
+        cursor.execute("""
+            DELETE FROM IdempotencyKeys
+            WHERE expires_at <= (SELECT expires_at FROM IdempotencyKeys ORDER BY expires_at DESC LIMIT 1 OFFSET ?)
+        """, (max_keys,))
+        evicted = cursor.rowcount
+        connection.commit()
+    return expired, evicted
+
+# Counts the stored idempotency keys
+def db_count_idempotency_keys():
+    with get_idempotency_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT COUNT(*) FROM IdempotencyKeys')
+        return cursor.fetchone()[0]
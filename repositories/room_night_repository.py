@@ -0,0 +1,67 @@
+import sqlite3
+from datetime import timedelta
+from database.connection import get_connection
+from database.data_versions import ROOM_NIGHTS, bump_data_version
+
+# Returns the nights (YYYY-MM-DD) of a stay, start date inclusive and end (check-out) date exclusive
+def _nights(start_date, end_date):
+    return [(start_date + timedelta(days=offset)).strftime('%Y-%m-%d')
+            for offset in range((end_date - start_date).days)]
+
+# Marks a room as occupied for every night of a stay; returns None if the room does not exist, False on overlap
+def db_reserve_room_nights(room_id, start_date, end_date):
+    nights = _nights(start_date, end_date)
+
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+
+        cursor.execute('SELECT id FROM Rooms WHERE id = ?', (room_id,))
+        if cursor.fetchone() is None:
+            connection.rollback()
+            return None
+
+        # The (room_id, night) primary key rejects nights that are already occupied
+        try:
+            cursor.executemany('INSERT INTO RoomNights (room_id, night) VALUES (?, ?)',
+                               [(room_id, night) for night in nights])
+        except sqlite3.IntegrityError:
+            connection.rollback()
+            return False
+
+        connection.commit()
+    bump_data_version(ROOM_NIGHTS)
+    return True
+
+# Frees the nights of a stay for a room and returns the number of nights released
+def db_release_room_nights(room_id, start_date, end_date):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            DELETE FROM RoomNights
+            WHERE room_id = ? AND night >= ? AND night < ?
+        """, (room_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+        connection.commit()
+        released = cursor.rowcount
+    bump_data_version(ROOM_NIGHTS)
+    return released
+
+# Gets all room types with the number of rooms free for every night of a stay (end date exclusive)
+def db_get_room_types_availability_for_range(start_date, end_date):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+
+        # One index probe into RoomNights per room, independent of how many nights are booked overall
+        cursor.execute("""
+            SELECT RoomTypes.id, RoomTypes.type_name, RoomTypes.base_price,
+                   (SELECT COUNT(*) FROM Rooms
+                    WHERE Rooms.room_type_id = RoomTypes.id
+                      AND NOT EXISTS (
+                          SELECT 1 FROM RoomNights
+                          WHERE RoomNights.room_id = Rooms.id AND RoomNights.night >= ? AND RoomNights.night < ?
+                      )) as available_count,
+                   RoomTypes.max_count
+            FROM RoomTypes
+            ORDER BY RoomTypes.id
+        """, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+        return [dict(row) for row in cursor.fetchall()]
@@ -1,58 +1,178 @@
-from database.connection import create_connection
+import json
+from database.connection import get_connection
+from database.data_versions import ROOMS, bump_data_version
+from database.snapshot import get_read_connection
 
-# Retrieves all rooms with type information, excluding max_count
-def db_get_rooms():
-    connection = create_connection()
-    cursor = connection.cursor()
-    cursor.execute("""
+# Builds the rooms query with optional filters, keyset pagination (after_id) and limit, ordered by id
+def _rooms_query(after_id=None, limit=None, room_type_id=None, availability=None):
+    conditions = []
+    parameters = []
+
+    # Filters on room_type_id and availability can use rooms_idx_room_type_id / rooms_idx_availability
+    if room_type_id is not None:
+        conditions.append('Rooms.room_type_id = ?')
+        parameters.append(room_type_id)
+    if availability is not None:
+        conditions.append('Rooms.availability = ?')
+        parameters.append(availability)
+    if after_id is not None:
+        conditions.append('Rooms.id > ?')
+        parameters.append(after_id)
+
+    query = """
         SELECT Rooms.id, Rooms.room_type_id, Rooms.availability, RoomTypes.type_name, RoomTypes.base_price
         FROM Rooms
         INNER JOIN RoomTypes ON Rooms.room_type_id = RoomTypes.id
-    """)
-    result = [dict(row) for row in cursor.fetchall()]
-    connection.close()
-    return result
+    """
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY Rooms.id'
+    if limit is not None:
+        query += ' LIMIT ?'
+        parameters.append(limit)
+    return query, parameters
+
+# Retrieves rooms with type information, excluding max_count (optionally filtered and paginated)
+def db_get_rooms(after_id=None, limit=None, room_type_id=None, availability=None):
+    query, parameters = _rooms_query(after_id, limit, room_type_id, availability)
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, parameters)
+        return [dict(row) for row in cursor.fetchall()]
+
+# JSON object of a room built by SQLite, keys sorted like the JSON provider sorts them
+_ROOM_JSON = """json_object('availability', availability, 'base_price', base_price, 'id', id,
+                            'room_type_id', room_type_id, 'type_name', type_name)"""
+
+# Retrieves rooms like db_get_rooms, serialized by SQLite's json_group_array without building a dict per row
+# Returns (JSON array text, number of rooms, id of the last room or None)
+def db_get_rooms_json(after_id=None, limit=None, room_type_id=None, availability=None):
+    query, parameters = _rooms_query(after_id, limit, room_type_id, availability)
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
+
+        # The subquery is ordered by id, json_group_array keeps that order
+        cursor.execute(f"""
+            SELECT json_group_array({_ROOM_JSON}) as rooms, COUNT(*) as count, MAX(id) as last_id
+            FROM ({query})
+        """, parameters)
+        result = cursor.fetchone()
+    return result['rooms'], result['count'], result['last_id']
+
+# Yields rooms as JSON object texts in keyset batches of batch_size rows (optionally after after_id, at most limit)
+# Each batch borrows a pooled connection only while it is read, so slow consumers do not hold one for the whole stream
+def db_iter_rooms_json(room_type_id=None, availability=None, after_id=None, limit=None, batch_size=500):
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        query, parameters = _rooms_query(after_id, size, room_type_id, availability)
+        with get_read_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f'SELECT {_ROOM_JSON} as room, id FROM ({query})', parameters)
+            rows = cursor.fetchall()
+
+        for row in rows:
+            yield row['room']
+        if len(rows) < size:
+            return
+        after_id = rows[-1]['id']
+        if remaining is not None:
+            remaining -= len(rows)
 
 # Gets specific room by id with type information, excluding max_count
 def db_get_room(id):
-    connection = create_connection()
-    cursor = connection.cursor()
-    cursor.execute("""
-        SELECT Rooms.id, Rooms.room_type_id, Rooms.availability, RoomTypes.type_name, RoomTypes.base_price
-        FROM Rooms
-        INNER JOIN RoomTypes ON Rooms.room_type_id = RoomTypes.id
-        WHERE Rooms.id = ?
-    """, (id,))
-    result = cursor.fetchone()
-    connection.close()
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT Rooms.id, Rooms.room_type_id, Rooms.availability, RoomTypes.type_name, RoomTypes.base_price
+            FROM Rooms
+            INNER JOIN RoomTypes ON Rooms.room_type_id = RoomTypes.id
+            WHERE Rooms.id = ?
+        """, (id,))
+        result = cursor.fetchone()
     return dict(result) if result else None
 
-# Updates room availability
+# Updates room availability, returns False if the room does not exist
 def db_update_room_availability(id, availability):
-    connection = create_connection()
-    cursor = connection.cursor()
-    cursor.execute("""
-        UPDATE Rooms 
-        SET availability = ?
-        WHERE id = ?
-    """, (availability, id))
-    connection.commit()
-    connection.close()
-    return True
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            UPDATE Rooms
+            SET availability = ?
+            WHERE id = ?
+        """, (availability, id))
+        updated = cursor.rowcount > 0
+        connection.commit()
+
+    if updated:
+        bump_data_version(ROOMS)
+    return updated
+
+# Applies (room_id, availability) updates in one transaction, returns the set of room ids that do not exist
+def db_update_rooms_availability(updates):
+    room_ids = sorted({room_id for room_id, _ in updates})
+    with get_connection() as connection:
+        cursor = connection.cursor()
+
+        # Look up all requested ids with one statement, passed as a JSON array to stay below the variable limit
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT id FROM Rooms WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(room_ids),))
+        existing = {row['id'] for row in cursor.fetchall()}
+
+        cursor.executemany('UPDATE Rooms SET availability = ? WHERE id = ?',
+                           [(availability, room_id) for room_id, availability in updates if room_id in existing])
+        connection.commit()
+
+    if existing:
+        bump_data_version(ROOMS)
+    return set(room_ids) - existing
 
 # Returns first available room of specified type
 def db_available_room_of_type(room_type_id):
-    connection = create_connection()
-    cursor = connection.cursor()
-
-    # Select first available room of specified type
-    cursor.execute("""
-        SELECT id FROM Rooms 
-        WHERE room_type_id = ? AND availability = 1
-        LIMIT 1
-    """, (room_type_id,))
-    room = cursor.fetchone()
-
-    connection.close()
-    
+    with get_connection() as connection:
+        cursor = connection.cursor()
+
+        # Select first available room of specified type
+        cursor.execute("""
+            SELECT id FROM Rooms
+            WHERE room_type_id = ? AND availability = 1
+            LIMIT 1
+        """, (room_type_id,))
+        room = cursor.fetchone()
+
     return room['id'] if room else None
+
+# Atomically claims up to count available rooms of specified type and returns their ids (all or nothing)
+def db_allocate_rooms(room_type_id, count=1):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+
+        # BEGIN IMMEDIATE takes the write lock before reading, so concurrent allocations cannot pick the same room
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute("""
+            UPDATE Rooms
+            SET availability = 0
+            WHERE id IN (
+                SELECT id FROM Rooms
+                WHERE room_type_id = ? AND availability = 1
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING id
+        """, (room_type_id, count))
+        room_ids = sorted(row['id'] for row in cursor.fetchall())
+
+        # Not enough free rooms, release the ones claimed so far
+        if len(room_ids) < count:
+            connection.rollback()
+            return []
+
+        connection.commit()
+
+    bump_data_version(ROOMS)
+    return room_ids
+
+# Atomically claims the first available room of specified type
+def db_allocate_room(room_type_id):
+    room_ids = db_allocate_rooms(room_type_id, 1)
+    return room_ids[0] if room_ids else None
@@ -1,67 +1,174 @@
-from database.connection import create_connection
+import json
+import threading
+import time
+from database.connection import get_connection
+from database.data_versions import ROOM_TYPES, bump_data_version
+from database.snapshot import get_read_connection, get_read_data_versions
 
-# Gets all room types 
+# Minimum seconds between reloads of the room type id set caused by unknown ids
+ROOM_TYPE_IDS_REFRESH_SECONDS = 5.0
+
+_room_type_ids = None
+_room_type_ids_versions = None
+_room_type_ids_loaded_at = 0.0
+_room_type_ids_lock = threading.Lock()
+
+# Loads the ids of all room types from the read source of prices (the snapshot in snapshot mode)
+def _db_load_room_type_ids(versions):
+    global _room_type_ids, _room_type_ids_versions, _room_type_ids_loaded_at
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT id FROM RoomTypes')
+        _room_type_ids = frozenset(row['id'] for row in cursor.fetchall())
+    _room_type_ids_versions = versions
+    _room_type_ids_loaded_at = time.monotonic()
+
+# Checks if a room type exists using an in-memory id set instead of a query per request
+# The set is read like the base prices and reloaded when their read version changes, so both agree
+def db_room_type_exists(id):
+    versions = get_read_data_versions((ROOM_TYPES,))
+    with _room_type_ids_lock:
+        if _room_type_ids is None or _room_type_ids_versions != versions:
+            _db_load_room_type_ids(versions)
+        if id in _room_type_ids:
+            return True
+
+        # Room types may have been added by another process, reload (rate limited so unknown ids stay cheap)
+        if time.monotonic() - _room_type_ids_loaded_at >= ROOM_TYPE_IDS_REFRESH_SECONDS:
+            _db_load_room_type_ids(versions)
+            return id in _room_type_ids
+        return False
+
+# Drops the in-memory room type id set so it is reloaded on next use
+def invalidate_room_type_ids():
+    global _room_type_ids
+    with _room_type_ids_lock:
+        _room_type_ids = None
+
+# Gets all room types
 def db_get_room_types():
-    connection = create_connection()
-    cursor = connection.cursor()
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
 
-    # Retrieve all room types from the RoomTypes table and order them by base price
-    cursor.execute('SELECT * FROM RoomTypes ORDER BY base_price')
-    result = [dict(row) for row in cursor.fetchall()]
-    connection.close()
-    return result
+        # Retrieve all room types from the RoomTypes table and order them by base price
+        cursor.execute('SELECT * FROM RoomTypes ORDER BY base_price')
+        return [dict(row) for row in cursor.fetchall()]
 
 # Gets all room types with availability
 def db_get_room_types_with_availability():
-    connection = create_connection()
-    cursor = connection.cursor()
-
-    # Retrieve all room types from the RoomTypes table with max_count and available_count and order them by id
-    cursor.execute("""
-        SELECT RoomTypes.id, RoomTypes.type_name, RoomTypes.base_price, COUNT(Rooms.id) as available_count, RoomTypes.max_count
-        FROM RoomTypes
-        LEFT JOIN Rooms ON RoomTypes.id = Rooms.room_type_id AND Rooms.availability = 1
-        GROUP BY RoomTypes.id
-    """)
-    result = [dict(row) for row in cursor.fetchall()]
-    connection.close()
-    return result
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
+
+        # Retrieve all room types with max_count and the trigger-maintained available_count, ordered by id
+        cursor.execute("""
+            SELECT RoomTypes.id, RoomTypes.type_name, RoomTypes.base_price,
+                   COALESCE(RoomTypeAvailability.available_count, 0) as available_count, RoomTypes.max_count
+            FROM RoomTypes
+            LEFT JOIN RoomTypeAvailability ON RoomTypes.id = RoomTypeAvailability.room_type_id
+            ORDER BY RoomTypes.id
+        """)
+        return [dict(row) for row in cursor.fetchall()]
+
+# Gets all room types with availability like db_get_room_types_with_availability as a JSON array text built by SQLite
+def db_get_room_types_with_availability_json():
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT json_group_array(json_object(
+                       'available_count', available_count, 'base_price', base_price, 'id', id,
+                       'max_count', max_count, 'type_name', type_name)) as room_types,
+                   COUNT(*) as count
+            FROM (
+                SELECT RoomTypes.id, RoomTypes.type_name, RoomTypes.base_price,
+                       COALESCE(RoomTypeAvailability.available_count, 0) as available_count, RoomTypes.max_count
+                FROM RoomTypes
+                LEFT JOIN RoomTypeAvailability ON RoomTypes.id = RoomTypeAvailability.room_type_id
+                ORDER BY RoomTypes.id
+            )
+        """)
+        result = cursor.fetchone()
+    return result['room_types'], result['count']
 
 # Gets specific room type by id
 def db_get_room_type(id):
-    connection = create_connection()
-    cursor = connection.cursor()
-    cursor.execute('SELECT * FROM RoomTypes WHERE id = ?', (id,))
-    result = cursor.fetchone()
-    connection.close()
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT * FROM RoomTypes WHERE id = ?', (id,))
+        result = cursor.fetchone()
     return dict(result) if result else None
 
 # Gets room type base price
 def db_get_room_base_price(id):
-    connection = create_connection()
-    cursor = connection.cursor()
-    cursor.execute('SELECT base_price FROM RoomTypes WHERE id = ?', (id,))
-    result = cursor.fetchone()
-    connection.close()
+    with get_read_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT base_price FROM RoomTypes WHERE id = ?', (id,))
+        result = cursor.fetchone()
     return result['base_price'] if result else None
 
 # Add new room type
 def db_add_room_type(type_name, base_price, max_count):
-    connection = create_connection()
-    cursor = connection.cursor()
-    cursor.execute("""
-        INSERT INTO RoomTypes (type_name, base_price, max_count)
-        VALUES (?, ?, ?)
-    """, (type_name, base_price, max_count))
-    connection.commit()
-    connection.close()
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            INSERT INTO RoomTypes (type_name, base_price, max_count)
+            VALUES (?, ?, ?)
+        """, (type_name, base_price, max_count))
+        connection.commit()
+    invalidate_room_type_ids()
+    bump_data_version(ROOM_TYPES)
     return True
 
-# Updates room type price
-def db_update_room_type_price(id, base_price):
-    connection = create_connection()
-    cursor = connection.cursor()
-    cursor.execute('UPDATE RoomTypes SET base_price = ? WHERE id = ?', (base_price, id))
-    connection.commit()
-    connection.close()
-    return True
+# Updates room type price and version, only if the version still is expected_version (when given)
+# Returns (new version, current version): (version, version) when updated, (None, current version) if the version
+# did not match, (None, None) if the room type does not exist; always read from the primary database
+def db_update_room_type_price(id, base_price, expected_version=None):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("""
+            UPDATE RoomTypes
+            SET base_price = ?, version = version + 1
+            WHERE id = ? AND (? IS NULL OR version = ?)
+            RETURNING version
+        """, (base_price, id, expected_version, expected_version))
+        result = cursor.fetchone()
+
+        # Nothing updated, tell a missing room type apart from a version conflict
+        if result is None:
+            cursor.execute('SELECT version FROM RoomTypes WHERE id = ?', (id,))
+            current = cursor.fetchone()
+            connection.rollback()
+            return None, current['version'] if current else None
+
+        connection.commit()
+    bump_data_version(ROOM_TYPES)
+    return result['version'], result['version']
+
+# Updates the prices of many room types in one transaction (all or nothing)
+# prices holds (id, base_price, expected_version or None); returns ({id: new version}, []) on success,
+# otherwise ({}, [{"room_type_id", "error", "version"}]) for every missing room type or version conflict
+def db_update_room_type_prices(prices):
+    with get_connection() as connection:
+        cursor = connection.cursor()
+
+        # BEGIN IMMEDIATE takes the write lock first, so versions cannot change between the check and the update
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT id, version FROM RoomTypes WHERE id IN (SELECT value FROM json_each(?))',
+                       (json.dumps([id for id, _, _ in prices]),))
+        versions = {row['id']: row['version'] for row in cursor.fetchall()}
+
+        conflicts = []
+        for id, _, expected_version in prices:
+            if id not in versions:
+                conflicts.append({"room_type_id": id, "error": "Room type not found", "version": None})
+            elif expected_version is not None and versions[id] != expected_version:
+                conflicts.append({"room_type_id": id, "error": "Version mismatch", "version": versions[id]})
+        if conflicts:
+            connection.rollback()
+            return {}, conflicts
+
+        cursor.executemany('UPDATE RoomTypes SET base_price = ?, version = version + 1 WHERE id = ?',
+                           [(base_price, id) for id, base_price, _ in prices])
+        connection.commit()
+
+    bump_data_version(ROOM_TYPES)
+    return {id: versions[id] + 1 for id, _, _ in prices}, []
@@ -0,0 +1,179 @@
+import os
+import threading
+from array import array
+from calendar import monthrange
+from datetime import date
+from database.connection import get_connection
+
+# Multiplier used for dates that are not covered by any season
+DEFAULT_MULTIPLIER = 1.0
+
+# Years covered by the compiled calendar (can be overridden with environment variables), extended to cover overrides
+SEASON_CALENDAR_FIRST_YEAR = int(os.environ.get('SEASON_CALENDAR_FIRST_YEAR', 2024))
+SEASON_CALENDAR_YEARS = int(os.environ.get('SEASON_CALENDAR_YEARS', 30))
+
+# Day index value of days without a season
+NO_SEASON = -1
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+# Converts a date, datetime or YYYY-MM-DD string into a proleptic ordinal day number
+def _to_ordinal(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value).toordinal()
+    return value.toordinal()
+
+# Returns the date of a MM-DD month and day in a year, February 29 falls back to February 28 outside leap years
+def _month_day(year, month_day):
+    month, day = (int(part) for part in month_day.split('-'))
+    return date(year, month, min(day, monthrange(year, month)[1]))
+
+# Compiled season calendar: recurring rules and dated overrides expanded into one season index per day
+class SeasonCalendar:
+    def __init__(self, rules, overrides, first_year=SEASON_CALENDAR_FIRST_YEAR, years=SEASON_CALENDAR_YEARS):
+        last_year = first_year + years - 1
+        if overrides:
+            first_year = min(first_year, min(int(row['start_date'][:4]) for row in overrides))
+            last_year = max(last_year, max(int(row['end_date'][:4]) for row in overrides))
+        self.first = date(first_year, 1, 1).toordinal()
+        self.last = date(last_year, 12, 31).toordinal()
+
+        # Season occurrences (multiplier, season) and, for every day of the horizon, the occurrence covering it
+        self.occurrences = []
+        days = array('i', [NO_SEASON]) * (self.last - self.first + 1)
+
+        # Rules repeat every year; the previous year is expanded too for rules reaching into the first year
+        for row in rules:
+            for year in range(first_year - 1, last_year + 1):
+                start = _month_day(year, row['start_day'])
+                end = _month_day(year if row['end_day'] >= row['start_day'] else year + 1, row['end_day'])
+                self._fill(days, start, end, row, None, "Season rules overlap")
+
+        # Overrides replace the rules on their days but must not overlap each other
+        overridden = bytearray(len(days))
+        for row in sorted(overrides, key=lambda row: row['start_date']):
+            self._fill(days, date.fromisoformat(row['start_date']), date.fromisoformat(row['end_date']),
+                       row, overridden, "Season dates overlap")
+
+        # Runs of days with the same occurrence become segments (start, end, multiplier, season), gaps included
+        self.days = array('i', [0]) * len(days)
+        self.segments = []
+        for offset, occurrence in enumerate(days):
+            if offset == 0 or occurrence != days[offset - 1]:
+                multiplier, season = self.occurrences[occurrence] if occurrence != NO_SEASON else (DEFAULT_MULTIPLIER, None)
+                self.segments.append([self.first + offset, self.first + offset, multiplier, season])
+            self.segments[-1][1] = self.first + offset
+            self.days[offset] = len(self.segments) - 1
+        self.segments = [tuple(segment) for segment in self.segments]
+
+    # Assigns the days of a season occurrence within the horizon, raising ValueError if a day is already taken
+    def _fill(self, days, start, end, row, overridden, error):
+        occurrence = len(self.occurrences)
+        self.occurrences.append((row['multiplier'], {
+            "id": row["season_id"],
+            "season_type": row["season_type"],
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat()
+        }))
+
+        for ordinal in range(max(start.toordinal(), self.first), min(end.toordinal(), self.last) + 1):
+            offset = ordinal - self.first
+            taken = overridden[offset] if overridden is not None else days[offset] != NO_SEASON
+            if taken:
+                other = self.occurrences[days[offset]][1]
+                raise ValueError(f"{error}: {other['season_type']} {other['start_date']}..{other['end_date']} and "
+                                 f"{row['season_type']} {start.isoformat()}..{end.isoformat()}")
+            days[offset] = occurrence
+            if overridden is not None:
+                overridden[offset] = 1
+
+    # Returns the segment covering the ordinal day, or None if the day has no season
+    def _lookup(self, ordinal):
+        if self.first <= ordinal <= self.last:
+            segment = self.segments[self.days[ordinal - self.first]]
+            if segment[3] is not None:
+                return segment
+        return None
+
+    # Returns the season (id, season_type, start_date, end_date) for a date
+    def season_for(self, day):
+        segment = self._lookup(_to_ordinal(day))
+        return dict(segment[3]) if segment else None
+
+    # Returns the price multiplier for a date
+    def multiplier_for(self, day):
+        segment = self._lookup(_to_ordinal(day))
+        return segment[2] if segment else DEFAULT_MULTIPLIER
+
+    # Splits an inclusive date range into (nights, multiplier, season) pieces, days without season use the default
+    def stay_segments(self, start_date, end_date):
+        first = _to_ordinal(start_date)
+        last = _to_ordinal(end_date)
+        pieces = []
+        if first > last:
+            return pieces
+
+        # Days before the compiled horizon
+        current = first
+        if current < self.first:
+            stop = min(last, self.first - 1)
+            pieces.append((stop - current + 1, DEFAULT_MULTIPLIER, None))
+            current = stop + 1
+
+        # The day index gives the first segment, following segments are consecutive
+        if current <= min(last, self.last):
+            index = self.days[current - self.first]
+            while current <= last and index < len(self.segments):
+                _, end, multiplier, season = self.segments[index]
+                stop = min(end, last)
+                pieces.append((stop - current + 1, multiplier, season))
+                current = stop + 1
+                index += 1
+
+        # Days after the compiled horizon
+        if current <= last:
+            pieces.append((last - current + 1, DEFAULT_MULTIPLIER, None))
+        return pieces
+
+    # Sum of nightly multipliers over an inclusive date range, O(number of segments)
+    def total_multiplier(self, start_date, end_date):
+        return sum(nights * multiplier for nights, multiplier, _ in self.stay_segments(start_date, end_date))
+
+# Loads the season rules and dated overrides with their multipliers and compiles the calendar
+def _db_load_season_calendar():
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute('''
+            SELECT SeasonRules.id, SeasonRules.season_id, SeasonRules.start_day, SeasonRules.end_day,
+                   Seasons.season_type, Seasons.multiplier
+            FROM SeasonRules
+            INNER JOIN Seasons ON Seasons.id = SeasonRules.season_id
+            ORDER BY SeasonRules.id
+        ''')
+        rules = cursor.fetchall()
+        cursor.execute('''
+            SELECT SeasonDates.id, SeasonDates.season_id, SeasonDates.start_date, SeasonDates.end_date,
+                   Seasons.season_type, Seasons.multiplier
+            FROM SeasonDates
+            INNER JOIN Seasons ON Seasons.id = SeasonDates.season_id
+        ''')
+        overrides = cursor.fetchall()
+    return SeasonCalendar(rules, overrides)
+
+# Returns the cached season calendar, compiling it from the database on first use
+def get_season_calendar():
+    global _calendar
+    calendar = _calendar
+    if calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                _calendar = _db_load_season_calendar()
+            calendar = _calendar
+    return calendar
+
+# Drops the cached season calendar, must be called whenever Seasons, SeasonRules or SeasonDates change
+def invalidate_season_calendar():
+    global _calendar
+    with _calendar_lock:
+        _calendar = None